@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+
+
+class MysiteConfig(AppConfig):
+    """Project wide setup."""
+
+    name = 'mysite'
+
+    def ready(self):
+        """Configure new database connections and keep the user cache fresh."""
+        from .auth import forget_saved_user
+        from .sqlite import configure_connection
+        connection_created.connect(configure_connection)
+        post_save.connect(forget_saved_user, sender=get_user_model())
+        post_delete.connect(forget_saved_user, sender=get_user_model())
@@ -0,0 +1,65 @@
+"""Authentication backend keeping recently used users in memory.
+
+AuthenticationMiddleware looks the user up on every request. With
+AUTH_USER_CACHE_TTL above zero, CachedModelBackend keeps each user it has
+loaded for that many seconds in a dict of this process, so page views of a
+logged in user cost no query once the session is cached as well (see
+SESSION_ENGINE). A user is dropped from the cache when they log in or out
+or when their row is saved or deleted in this process; other processes
+notice such changes after at most AUTH_USER_CACHE_TTL seconds.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+# entries kept before expired ones are dropped
+MAX_ENTRIES = 1000
+
+_lock = threading.Lock()
+_users = {}
+
+
+def forget_user(user_id):
+    """Drop a user from the cache of this process."""
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def clear_user_cache():
+    """Drop every cached user."""
+    with _lock:
+        _users.clear()
+
+
+def forget_saved_user(sender, instance, **kwargs):
+    """Drop a saved or deleted user from the cache."""
+    forget_user(instance.pk)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() reads from a short-lived cache."""
+
+    def get_user(self, user_id):
+        """Return a copy of the cached user, loading it on a miss."""
+        ttl = settings.AUTH_USER_CACHE_TTL
+        if ttl <= 0:
+            return super().get_user(user_id)
+        now = time.monotonic()
+        with _lock:
+            expires, user = _users.get(user_id, (0, None))
+        if expires <= now:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            with _lock:
+                if len(_users) >= MAX_ENTRIES:
+                    for key in [key for key, (expires, _) in _users.items() if expires <= now]:
+                        del _users[key]
+                    if len(_users) >= MAX_ENTRIES:
+                        _users.clear()
+                _users[user_id] = (now + ttl, user)
+        # every request gets its own instance to change
+        return copy.copy(user)
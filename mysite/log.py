@@ -0,0 +1,103 @@
+"""Logging that keeps disk I/O and formatting off the request threads.
+
+QueueFileHandler puts records on an in-memory queue; a QueueListener
+thread formats them and writes them to the file. JsonFormatter writes one
+JSON object per line, including the question_id, choice_id, user_id and ip
+fields that callers pass with `extra`.
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+
+# record attributes copied to the JSON line when a caller sets them with `extra`
+STRUCTURED_FIELDS = ('question_id', 'choice_id', 'user_id', 'ip')
+
+
+class QueueFileHandler(logging.Handler):
+    """Write log records to a file from a background thread.
+
+    The request thread only merges the message with its arguments and puts
+    the record on a bounded queue. If the queue is full the record is
+    dropped rather than making the request wait.
+
+    This isn't a QueueHandler subclass: since Python 3.12 dictConfig expects
+    those to list the handlers their listener feeds, and the handler owns
+    its queue and listener instead.
+
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, delay=False, queue_size=10000):
+        """Open the file handler and start the listener thread."""
+        super().__init__()
+        self.queue = queue.Queue(queue_size)
+        self.target = logging.FileHandler(filename, mode, encoding, delay)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        self.dropped = 0
+
+    def setFormatter(self, fmt):
+        """Set the formatter of the file handler, so formatting happens on the listener thread."""
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        """Queue a prepared copy of the record."""
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record):
+        """Detach the record from the caller's objects before it crosses threads.
+
+        The record is copied, other handlers of the logger still see the
+        original message, arguments and exception.
+
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """Queue a record without blocking."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Write the queued records and close the file."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one line of JSON."""
+
+    def format(self, record):
+        """Return the JSON line of a record."""
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': f'{record.module}.{record.funcName}',
+            'line': record.lineno,
+            'message': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
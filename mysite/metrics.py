@@ -0,0 +1,208 @@
+"""Per-view latency and database metrics in Prometheus text format.
+
+MetricsMiddleware times every request and counts the queries it runs and
+the time they take, then files the numbers under the URL name of the view
+(polls:index, polls:results, ...). Queries are counted by a database
+execute wrapper that reads the current request from a context variable,
+so it works for sync and async views alike and doesn't need DEBUG.
+
+The numbers are kept in memory for the life of the process and served in
+the Prometheus text format at /metrics, to staff only.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+UNRESOLVED = '<unresolved>'
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def _install(connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+class Histogram:
+    """Cumulative counts of observations per upper bound, with their sum."""
+
+    def __init__(self, buckets):
+        """Create an empty histogram with the given upper bounds."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Add one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        """Return the number of observations."""
+        return sum(self.counts)
+
+
+class ViewMetrics:
+    """The metrics of one view."""
+
+    def __init__(self):
+        """Create empty metrics."""
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.over_budget = 0
+
+
+class Registry:
+    """Thread-safe store of the metrics of every view."""
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, duration, queries, db_seconds, over_budget):
+        """Add one request to the metrics of a view."""
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.duration.observe(duration)
+            metrics.queries.observe(queries)
+            metrics.db_seconds += db_seconds
+            metrics.over_budget += over_budget
+
+    def reset(self):
+        """Forget every recorded request."""
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            views = sorted(self._views.items())
+            _histogram(lines, 'polls_request_duration_seconds', 'Time taken to answer a request.',
+                       [(view, metrics.duration) for view, metrics in views])
+            _histogram(lines, 'polls_request_db_queries', 'Database queries run by a request.',
+                       [(view, metrics.queries) for view, metrics in views])
+            lines.append('# HELP polls_request_db_seconds_total Time spent in database queries.')
+            lines.append('# TYPE polls_request_db_seconds_total counter')
+            for view, metrics in views:
+                lines.append(f'polls_request_db_seconds_total{{view="{view}"}} {metrics.db_seconds!r}')
+            lines.append('# HELP polls_request_over_query_budget_total Requests that ran more queries '
+                         'than METRICS_QUERY_BUDGET.')
+            lines.append('# TYPE polls_request_over_query_budget_total counter')
+            for view, metrics in views:
+                lines.append(f'polls_request_over_query_budget_total{{view="{view}"}} {metrics.over_budget}')
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram(lines, name, help_text, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for view, histogram in histograms:
+        total = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            total += count
+            lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {total}')
+        lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum!r}')
+        lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Record the latency and the database use of every request, per view."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Start counting queries on every database connection."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install)
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+
+    def __call__(self, request):
+        """Answer a request and record its metrics."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, start = self._start()
+        try:
+            return self.get_response(request)
+        finally:
+            self._finish(request, stats, token, start)
+
+    async def __acall__(self, request):
+        """Answer a request under ASGI and record its metrics."""
+        stats, token, start = self._start()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._finish(request, stats, token, start)
+
+    @staticmethod
+    def _start():
+        stats = _RequestStats()
+        return stats, _current.set(stats), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, stats, token, start):
+        duration = time.perf_counter() - start
+        _current.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        budget = settings.METRICS_QUERY_BUDGET
+        over_budget = bool(budget) and stats.queries > budget
+        if over_budget:
+            logger.warning('%s ran %d queries, over the budget of %d: %s',
+                           view, stats.queries, budget, request.path)
+        registry.record(view, duration, stats.queries, stats.db_seconds, over_budget)
+
+
+@staff_member_required
+def metrics(request):
+    """Return the metrics of this process in the Prometheus text format."""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,97 @@
+"""Send read-only queries to read replicas.
+
+Queries only go to a replica inside a replica_reads() block, which the
+index, results and detail views wrap around their read-only queries.
+Everything else, including sessions, auth and every write, uses the
+primary ('default') database. After a user votes, pin_to_primary() sets a
+cookie that keeps their reads on the primary for REPLICA_STICKY_SECONDS so
+they see their own vote even if the replicas lag behind.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+STICKY_COOKIE = 'polls_primary_until'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Let the reads inside the block go to a replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_to_primary(response):
+    """Make the client read from the primary for the next REPLICA_STICKY_SECONDS."""
+    if settings.DATABASE_REPLICAS:
+        until = int(time.time()) + settings.REPLICA_STICKY_SECONDS
+        response.set_cookie(STICKY_COOKIE, str(until), max_age=settings.REPLICA_STICKY_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+class ReplicaRouter:
+    """Database router choosing a random replica for reads in a replica_reads() block."""
+
+    def db_for_read(self, model, **hints):
+        """Return a replica alias, or None for the primary."""
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _replica_reads.get() and not _pinned.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary only."""
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between objects read from any copy of the data."""
+        return True
+
+
+class StickyPrimaryMiddleware:
+    """Keep the reads of a client on the primary while its sticky cookie is valid."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wrap get_response as a sync or async middleware."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Answer a request, pinned to the primary if needed."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pinned.set(self._is_pinned(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+    async def __acall__(self, request):
+        """Answer a request under ASGI, pinned to the primary if needed."""
+        token = _pinned.set(self._is_pinned(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+    @staticmethod
+    def _is_pinned(request):
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
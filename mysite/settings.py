@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 import os
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mysite.static.StaticFilesMiddleware',
+    'mysite.metrics.MetricsMiddleware',
+    'mysite.routers.StickyPrimaryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +89,58 @@ DATABASES = {
     }
 }
 
+# SQLite write-ahead logging for concurrent voters, see mysite/sqlite.py
+SQLITE_CONCURRENCY_MODE = config('SQLITE_CONCURRENCY_MODE', default=False, cast=bool)
+# milliseconds a connection waits for a lock before "database is locked"
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)
+# attempts of a vote write that fails with "database is locked"
+DATABASE_LOCK_RETRIES = config('DATABASE_LOCK_RETRIES', default=5, cast=int)
+
+# Read replicas: a comma separated list of database names using the same
+# engine and credentials as 'default', e.g. a second SQLite file. They are
+# called replica1, replica2, ... and only serve reads, see mysite/routers.py.
+DATABASE_REPLICAS = []
+for number, name in enumerate(config('DATABASE_REPLICAS', default='', cast=Csv()), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['mysite.routers.ReplicaRouter']
+
+# seconds a client keeps reading from the primary after it votes
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # per-question poll results and the poll index, see polls/cache.py;
+    # LocMemCache is per process, use a shared backend with several workers
+    'results': {
+        'BACKEND': config('RESULTS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('RESULTS_CACHE_LOCATION', default='polls-results'),
+        'TIMEOUT': config('RESULTS_CACHE_TTL', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('RESULTS_CACHE_MAX_ENTRIES', default=1000, cast=int),
+        },
+    },
+}
+
+# seconds a rendered poll index page or question list is kept
+POLLS_INDEX_CACHE_TTL = config('POLLS_INDEX_CACHE_TTL', default=300, cast=int)
+
+# Sessions and authentication
+# cached_db reads sessions from the 'default' cache and falls back to the
+# database, 'django.contrib.sessions.backends.signed_cookies' needs neither
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = config('SESSION_CACHE_ALIAS', default='default')
+AUTHENTICATION_BACKENDS = ['mysite.auth.CachedModelBackend']
+# seconds a loaded user is kept in memory by each process, 0 turns it off
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -116,17 +171,23 @@ LOGGING = {
             'format': '%(asctime)s %(levelname)-5s %(module)s.%(funcName)s:%(lineno)d  %(message)s',
             'datefmt': "%Y-%m-%d %H:%M"
         },
+        'json': {
+            '()': 'mysite.log.JsonFormatter',
+            'datefmt': "%Y-%m-%dT%H:%M:%S%z"
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose'
         },
+        # written by a background thread, see mysite/log.py
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': 'polls.log',
-            'formatter': 'logfile',
+            '()': 'mysite.log.QueueFileHandler',
+            'filename': config('POLLS_LOG_FILE', default='polls.log'),
+            # 'logfile' or 'json' for one JSON object per line
+            'formatter': config('POLLS_LOG_FORMAT', default='logfile'),
         },
     },
     'root': {
@@ -154,7 +215,57 @@ USE_L10N = True
 
 USE_TZ = True
 
+# Metrics
+
+# requests running more database queries than this are logged and counted, 0 turns it off
+METRICS_QUERY_BUDGET = config('METRICS_QUERY_BUDGET', default=0, cast=int)
+
+# Polls
+
+# number of questions on one page of the index
+POLLS_PER_PAGE = config('POLLS_PER_PAGE', default=20, cast=int)
+
+# largest number of questions in one request to the results API
+POLLS_API_MAX_IDS = config('POLLS_API_MAX_IDS', default=100, cast=int)
+# seconds after its end date before the results of a question are frozen,
+# see polls/lifecycle.py
+POLLS_FINALIZE_GRACE = config('POLLS_FINALIZE_GRACE', default=60, cast=int)
+# live results pages, see polls/live.py: seconds between two updates of a
+# question and seconds before a stream is closed and the browser reconnects
+POLLS_LIVE_INTERVAL = config('POLLS_LIVE_INTERVAL', default=1.0, cast=float)
+POLLS_LIVE_MAX_AGE = config('POLLS_LIVE_MAX_AGE', default=300, cast=int)
+
+# write-behind vote ingestion, see polls/ingest.py
+POLLS_VOTE_BUFFER = config('POLLS_VOTE_BUFFER', default=False, cast=bool)
+POLLS_VOTE_BUFFER_MAX_SIZE = config('POLLS_VOTE_BUFFER_MAX_SIZE', default=500, cast=int)
+POLLS_VOTE_BUFFER_FLUSH_INTERVAL = config('POLLS_VOTE_BUFFER_FLUSH_INTERVAL', default=1.0, cast=float)
+# 'memory' or 'journal'; every process writes its own journal, named after
+# POLLS_VOTE_BUFFER_JOURNAL with its process id appended
+POLLS_VOTE_BUFFER_DURABILITY = config('POLLS_VOTE_BUFFER_DURABILITY', default='memory')
+POLLS_VOTE_BUFFER_JOURNAL = config('POLLS_VOTE_BUFFER_JOURNAL', default=str(BASE_DIR / 'votes.journal'))
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# hashed file names and precompressed copies, see mysite/static.py
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'mysite.static.PollsStaticFilesStorage',
+        'OPTIONS': {
+            # on: {% static %} fails for files missing from the manifest,
+            # off: names are used as they are until collectstatic has run
+            'manifest_strict': config('STATIC_MANIFEST_STRICT', default=False, cast=bool),
+        },
+    },
+}
+# seconds browsers may keep a static file whose name has no hash
+STATIC_MAX_AGE = config('STATIC_MAX_AGE', default=3600, cast=int)
+# JPEG images wider than this are scaled down by collectstatic (needs Pillow)
+STATIC_IMAGE_MAX_WIDTH = config('STATIC_IMAGE_MAX_WIDTH', default=1920, cast=int)
+STATIC_IMAGE_QUALITY = config('STATIC_IMAGE_QUALITY', default=80, cast=int)
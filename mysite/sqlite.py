@@ -0,0 +1,62 @@
+"""SQLite settings for many concurrent voters.
+
+With SQLITE_CONCURRENCY_MODE on, every new SQLite connection switches to
+write-ahead logging, so readers no longer block the writer, waits up to
+SQLITE_BUSY_TIMEOUT milliseconds for a lock, and only syncs to disk at
+checkpoints (synchronous=NORMAL, which is safe with WAL).
+
+A transaction that starts by reading and then writes can still fail at
+once with "database is locked" when another connection is writing, because
+SQLite won't wait in that case. retry_on_lock() runs such a transaction
+again after a short, random, growing pause.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Set the WAL pragmas on a new SQLite connection when the concurrency mode is on."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_CONCURRENCY_MODE:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+
+
+def is_lock_error(error):
+    """Return True if a database error means another connection holds the lock."""
+    return 'database is locked' in str(error) or 'database table is locked' in str(error)
+
+
+def retry_on_lock(func=None, *, attempts=None, base_delay=0.01, max_delay=0.5):
+    """Retry func when it fails because the database is locked.
+
+    The pause before attempt n is random between 0 and base_delay * 2**n,
+    capped at max_delay. Nothing is retried inside an outer transaction,
+    whose work the failure has already undone.
+
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, attempts=attempts, base_delay=base_delay, max_delay=max_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tries = attempts or settings.DATABASE_LOCK_RETRIES
+        for attempt in range(tries):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if not is_lock_error(error) or connection.in_atomic_block or attempt == tries - 1:
+                    raise
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                logger.debug('%s: database is locked, retrying in %.3f s', func.__name__, delay)
+                time.sleep(delay)
+    return wrapper
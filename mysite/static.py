@@ -0,0 +1,207 @@
+"""Static files with hashed names, precompressed variants and long caching.
+
+`collectstatic` copies every file to STATIC_ROOT under a name containing a
+hash of its content (see ManifestStaticFilesStorage), then writes a gzip
+and, if the brotli package is installed, a brotli copy next to each text
+file. JPEG images are resized to STATIC_IMAGE_MAX_WIDTH and re-encoded if
+Pillow is installed and that makes them smaller; their hashed names include
+those settings, so new settings give new names.
+
+StaticFilesMiddleware serves the collected files when DEBUG is off. A
+hashed name never changes content, so it is sent with an immutable
+Cache-Control header and browsers don't revalidate it.
+"""
+import gzip
+import io
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils.crypto import md5
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.html')
+IMAGES = ('.jpg', '.jpeg')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# encoding, file suffix; preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class PollsStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also optimizes images and precompresses text files.
+
+    With manifest_strict off (see STORAGES), names are used as they are
+    until collectstatic has written a manifest.
+
+    """
+
+    def __init__(self, *args, manifest_strict=None, **kwargs):
+        """Create the storage, optionally overriding manifest_strict."""
+        super().__init__(*args, **kwargs)
+        if manifest_strict is not None:
+            self.manifest_strict = manifest_strict
+        self._hashed_names = None
+
+    def stored_name(self, name):
+        """Return the hashed name of a file, or its own name without a manifest unless manifest_strict is on."""
+        if not self.hashed_files and not self.manifest_strict:
+            return name
+        return super().stored_name(name)
+
+    def is_hashed(self, name):
+        """Return True if name is the hashed name of a collected file."""
+        # rebuilt only when collectstatic replaces or fills the manifest
+        hashed_files = self.hashed_files
+        if self._hashed_names is None or self._hashed_names[:2] != (id(hashed_files), len(hashed_files)):
+            self._hashed_names = (id(hashed_files), len(hashed_files), frozenset(hashed_files.values()))
+        return name in self._hashed_names[2]
+
+    def file_hash(self, name, content=None):
+        """Return the hash of a file, including the settings used to optimize JPEG images.
+
+        Images are optimized after hashing, so without the settings in the
+        hash new settings would change the content behind an immutable name.
+
+        """
+        file_hash = super().file_hash(name, content)
+        if file_hash is None or Image is None or not (name or '').lower().endswith(IMAGES):
+            return file_hash
+        key = f'{file_hash}:{settings.STATIC_IMAGE_MAX_WIDTH}:{settings.STATIC_IMAGE_QUALITY}'
+        return md5(key.encode(), usedforsecurity=False).hexdigest()[:12]
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash the collected files, then write their optimized and compressed variants."""
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.lower().endswith(IMAGES):
+                self._optimize_image(name)
+            elif name.endswith(COMPRESSIBLE):
+                self._compress(name)
+
+    def _optimize_image(self, name):
+        if Image is None:
+            return
+        with self.open(name) as file:
+            original = file.read()
+        image = Image.open(io.BytesIO(original))
+        max_width = settings.STATIC_IMAGE_MAX_WIDTH
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        output = io.BytesIO()
+        image.convert('RGB').save(output, 'JPEG', quality=settings.STATIC_IMAGE_QUALITY,
+                                  optimize=True, progressive=True)
+        if output.tell() < len(original):
+            self._replace(name, output.getvalue())
+
+    def _compress(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            # tiny files can grow when compressed
+            if len(compressed) < len(content):
+                self._replace(name + suffix, compressed)
+
+    def _replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows, without those refused with q=0."""
+    weights = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    wildcard = weights.pop('*', 0.0)
+    accepted = {coding for coding, weight in weights.items() if weight > 0}
+    if wildcard > 0:
+        accepted.update(coding for coding, _ in ENCODINGS if coding not in weights)
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files from STATIC_ROOT, compressed and cached when possible."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wrap get_response as a sync or async middleware."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Answer a request for a static file, or pass it on."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        """Answer a request for a static file under ASGI, or pass it on."""
+        return self.serve(request) or await self.get_response(request)
+
+    @staticmethod
+    def serve(request):
+        """Return a response for a collected static file, or None."""
+        if (settings.DEBUG or not settings.STATIC_ROOT or request.method not in ('GET', 'HEAD')
+                or not request.path.startswith(settings.STATIC_URL)):
+            return None
+        name = request.path[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        encoding = None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for candidate, suffix in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        is_hashed = getattr(staticfiles_storage, 'is_hashed', None)
+        if is_hashed is not None and is_hashed(name):
+            response['Cache-Control'] = IMMUTABLE
+        else:
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_MAX_AGE}'
+        return response
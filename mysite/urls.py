@@ -15,11 +15,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from . import views
+from . import metrics, views
 
 urlpatterns = [
     path('', views.index, name="main"),
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),
     path('polls/', include('polls.urls')),
+    path('metrics', metrics.metrics, name='metrics'),
 ]
@@ -1,6 +1,33 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import IntegerField, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Lower
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-from .models import Question, Choice
+from .models import Question, Choice, Vote
+from .search import FTS_TABLE, fts_available, match_expression, search_terms
+
+
+class CappedCountPaginator(Paginator):
+    """Paginator that stops counting rows after COUNT_LIMIT.
+
+    Counting every row of a large table is slower than showing a page of it,
+    so lists longer than the limit show COUNT_LIMIT rows and pages; search or
+    filter to reach the ones after it.
+
+    """
+
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        """Return the number of rows, at most COUNT_LIMIT."""
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        # only the primary keys, without the annotations of the list
+        return self.object_list.order_by().values('pk')[:self.COUNT_LIMIT].count()
 
 
 # Register your models here.
@@ -9,6 +36,9 @@ class ChoiceInline(admin.TabularInline):
 
     model = Choice
     extra = 3
+    max_num = 50
+    # kept by the vote() view and reconcile_vote_counts
+    readonly_fields = ['vote_count']
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -19,9 +49,78 @@ class QuestionAdmin(admin.ModelAdmin):
         ('Date information', {'fields': ['pub_date', 'end_date'], 'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'was_published_recently', 'is_published', 'can_vote')
+    list_display = ('question_text', 'pub_date', 'was_published_recently', 'status', 'total_votes')
     list_filter = ['pub_date']
     search_fields = ['question_text']
+    search_help_text = 'Questions containing the text, ignoring case.'
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        """Annotate the status and total votes of every question in SQL."""
+        totals = (Choice.objects.filter(question=OuterRef('pk')).order_by().values('question')
+                  .annotate(total=Sum('vote_count')).values('total'))
+        return super().get_queryset(request).with_status(timezone.now()).annotate(
+            total_votes=Coalesce(Subquery(totals, output_field=IntegerField()), 0))
+
+    def get_search_results(self, request, queryset, search_term):
+        """Find questions whose text contains the search term.
+
+        Whole words and word prefixes are looked up in the full-text index
+        where there is one, otherwise text starting with the term is matched
+        as a range of polls_question_text_lower_idx. Only when that finds
+        nothing is the table scanned for the term anywhere in the text.
+
+        """
+        term = search_term.strip().lower()
+        if not term:
+            return queryset, False
+        terms = search_terms(term)
+        if terms and fts_available(queryset.db):
+            found = queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match_expression(terms)]))
+        else:
+            found = queryset.alias(text_lower=Lower('question_text')).filter(
+                text_lower__gte=term, text_lower__lt=term[:-1] + chr(ord(term[-1]) + 1))
+        if found.exists():
+            return found, False
+        return queryset.filter(question_text__icontains=term), False
+
+    @admin.display(ordering='status')
+    def status(self, question):
+        """Return the status annotated by get_queryset()."""
+        return question.status
+
+    @admin.display(ordering='total_votes', description='Votes')
+    def total_votes(self, question):
+        """Return the total annotated by get_queryset()."""
+        return question.total_votes
+
+
+class VoteAdmin(admin.ModelAdmin):
+    """Read-only list of votes."""
+
+    list_display = ('id', 'user', 'question', 'choice', 'voted_at')
+    list_select_related = ('user', 'question', 'choice')
+    list_per_page = 100
+    ordering = ['-id']
+    search_fields = ['=user__username']
+    search_help_text = 'Votes of the user with this exact username.'
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        """Return False, votes are only cast on the site."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Return False, votes are only cast on the site."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Return False, deleting a vote would leave the stored vote counts wrong."""
+        return False
 
 
 admin.site.register(Question, QuestionAdmin)
+admin.site.register(Vote, VoteAdmin)
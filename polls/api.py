@@ -0,0 +1,206 @@
+"""JSON API for dashboards, live results and data exports."""
+import asyncio
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, Sum, Window
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import md5
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+
+from .cache import aget_results, aget_results_versions
+from .export import CONTENT_TYPES, astream_export, stream_export
+from .live import subscribe, unsubscribe
+from .models import Choice, Question
+from .timeline import HOUR, MINUTE, ROLLUPS, get_timeline
+
+
+# periods returned by timeline() without a `since` parameter
+TIMELINE_WINDOWS = {MINUTE: datetime.timedelta(days=1), HOUR: datetime.timedelta(days=30)}
+
+
+def parse_ids(value):
+    """Return the distinct question ids of a comma separated list, in order.
+
+    Raises ValueError if an id isn't a positive integer.
+
+    """
+    ids = []
+    for part in value.split(','):
+        question_id = int(part)
+        if question_id < 1:
+            raise ValueError(f'Invalid question id: {part}')
+        if question_id not in ids:
+            ids.append(question_id)
+    return ids
+
+
+async def results(request):
+    """Return the results of every question listed in the `ids` parameter as JSON.
+
+    The ETag and Last-Modified headers come from the results versions of
+    the questions, so a client whose copy is still current gets a 304
+    without any query.
+
+    Returns:
+    JsonResponse -- {"results": [{"id", "question_text", "total_votes", "choices"}]}
+
+    """
+    try:
+        ids = parse_ids(request.GET.get('ids', ''))
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma separated list of question ids.'}, status=400)
+    if len(ids) > settings.POLLS_API_MAX_IDS:
+        return JsonResponse({'error': f'At most {settings.POLLS_API_MAX_IDS} ids per request.'}, status=400)
+
+    versions = await aget_results_versions(ids)
+    etag = quote_etag(md5(
+        ','.join(f'{question_id}:{versions[question_id]}' for question_id in ids).encode(),
+        usedforsecurity=False).hexdigest())
+    last_modified = max(versions.values()) // 10 ** 9
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    rows = (Choice.objects
+            .filter(question_id__in=ids, question__pub_date__lte=timezone.now())
+            .annotate(total_votes=Window(Sum('vote_count'), partition_by=F('question_id')))
+            .values('question_id', 'question__question_text', 'total_votes', 'id', 'choice_text', 'vote_count')
+            .order_by('question_id', 'id'))
+    questions = {}
+    async for row in rows:
+        question = questions.setdefault(row['question_id'], {
+            'id': row['question_id'],
+            'question_text': row['question__question_text'],
+            'total_votes': row['total_votes'],
+            'choices': [],
+        })
+        total = row['total_votes']
+        question['choices'].append({
+            'id': row['id'],
+            'choice_text': row['choice_text'],
+            'votes': row['vote_count'],
+            'percent': 100.0 * row['vote_count'] / total if total else 0.0,
+        })
+
+    response = JsonResponse({'results': [questions[question_id] for question_id in ids if question_id in questions]})
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+async def timeline(request, pk):
+    """Return the votes of a question per minute or hour as JSON, read from the rollup tables only.
+
+    `resolution` is "minute" or "hour" (the default), and `since` an ISO
+    8601 time; by default the last day of minutes or the last 30 days of
+    hours are returned.
+
+    Returns:
+    JsonResponse -- {"question", "resolution", "timeline": [{"time", "votes", "choices"}]}
+
+    """
+    resolution = request.GET.get('resolution', HOUR)
+    if resolution not in ROLLUPS:
+        return JsonResponse({'error': 'resolution must be minute or hour.'}, status=400)
+    now = timezone.now()
+    since = now - TIMELINE_WINDOWS[resolution]
+    if 'since' in request.GET:
+        try:
+            since = parse_datetime(request.GET['since'])
+        except ValueError:
+            since = None
+        if since is None:
+            return JsonResponse({'error': 'since must be an ISO 8601 time.'}, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, datetime.timezone.utc)
+    if not await Question.objects.published(now).filter(pk=pk).aexists():
+        raise Http404('No question matches the given query.')
+    rows = await sync_to_async(get_timeline)(pk, resolution, since)
+    return JsonResponse({'question': pk, 'resolution': resolution, 'timeline': rows})
+
+
+@staff_member_required
+def export(request, kind, fmt):
+    """Stream the votes or the results as a CSV or JSON lines download, for staff only.
+
+    Under ASGI the rows come from an async iterator, so the server can send
+    them as they are read instead of collecting the whole file first.
+
+    """
+    if isinstance(request, ASGIRequest):
+        lines = astream_export(kind, fmt)
+    else:
+        lines = stream_export(kind, fmt)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+# milliseconds an EventSource waits before it reconnects
+LIVE_RETRY = 3000
+# seconds between comments that keep an idle stream open
+LIVE_KEEPALIVE = 15
+
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+async def live_results(request, pk):
+    """Stream the changes of the vote counts of a question as server-sent events.
+
+    The first event, `counts`, has the vote count of every choice; each
+    `delta` event after it has the change of the counts that moved and the
+    new total. A stream ends after POLLS_LIVE_MAX_AGE seconds and the
+    browser reconnects; this also bounds how long the stream of a client
+    that went away keeps its subscription. Streaming needs the ASGI server (mysite/asgi.py);
+    under WSGI only the counts are sent, so the page polls every LIVE_RETRY
+    milliseconds instead of holding a worker.
+
+    Returns:
+    StreamingHttpResponse -- text/event-stream
+
+    """
+    try:
+        question = await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404('No question matches the given query.')
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_live_events(question), content_type='text/event-stream')
+    else:
+        choices, total_votes = await aget_results(question)
+        counts = {choice['id']: choice['vote_count'] for choice in choices}
+        body = f'retry: {LIVE_RETRY}\n' + _event('counts', {'choices': counts, 'total_votes': total_votes})
+        response = HttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _live_events(question):
+    subscription = await subscribe(question)
+    try:
+        counts = {'choices': subscription.counts, 'total_votes': subscription.total_votes}
+        yield f'retry: {LIVE_RETRY}\n' + _event('counts', counts)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.POLLS_LIVE_MAX_AGE
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                deltas, total_votes = await asyncio.wait_for(subscription.get(), min(remaining, LIVE_KEEPALIVE))
+            except asyncio.TimeoutError:
+                if deadline > loop.time():
+                    yield ': keepalive\n\n'
+                continue
+            yield _event('delta', {'choices': deltas, 'total_votes': total_votes})
+    finally:
+        unsubscribe(question.id, subscription)
@@ -5,3 +5,7 @@ class PollsConfig(AppConfig):
     """Name of the AppConfig is poll."""
 
     name = 'polls'
+
+    def ready(self):
+        """Connect the signal handlers and register the checks of the app."""
+        from . import checks, signals  # noqa: F401
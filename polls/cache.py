@@ -0,0 +1,164 @@
+"""Versioned caches of poll results and of the poll index.
+
+Every question has a version stored next to its cached results. The
+version is the time in nanoseconds of the last committed vote on the
+question, or of when the version was first needed, so it also tells API
+clients when the results last changed. The vote() view bumps it after a
+vote is committed, so the next reader computes a fresh entry under the
+new key instead of the old entry being deleted. Stale entries simply age
+out of the cache.
+
+The poll index is cached the same way under a single question-table
+version. Signals bump it when a question or choice is saved or deleted
+(see polls/signals.py), and it also moves on by itself once the next
+question opens or closes.
+
+The versions live in the 'results' cache, so a bump only reaches the
+processes sharing that cache. The default LocMemCache is per process: with
+more than one worker, the others keep serving stale results and pages for
+up to their timeout. Multi-worker deployments need a shared backend such
+as Redis or memcached; `manage.py check --deploy` warns about this
+(polls.W001).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Question
+
+RESULTS_CACHE_ALIAS = 'results'
+QUESTIONS_VERSION_KEY = 'questions:version'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[RESULTS_CACHE_ALIAS]
+
+
+def _version_key(question_id):
+    return f'results:version:{question_id}'
+
+
+def _results_key(question_id, version):
+    return f'results:{question_id}:{version}'
+
+
+def _replica_timeout(queryset):
+    # Totals read from a replica may lag behind the version they are stored
+    # under, so they are only kept for as long as a replica is allowed to lag.
+    if queryset.db == DEFAULT_DB_ALIAS:
+        return {}
+    return {'timeout': settings.REPLICA_STICKY_SECONDS}
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+async def aget_results_version(question_id):
+    """Return the current results version of a question without blocking the event loop."""
+    cache = _cache()
+    key = _version_key(question_id)
+    version = await cache.aget(key)
+    if version is None:
+        # Start from the clock so that an evicted version can never come
+        # back to a value that still has an entry cached.
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def aget_results_versions(question_ids):
+    """Return a dict of the current results version of several questions."""
+    cache = _cache()
+    keys = {_version_key(question_id): question_id for question_id in question_ids}
+    found = await cache.aget_many(keys)
+    for key in keys.keys() - found.keys():
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        found[key] = await cache.aget(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_results_version(question_id):
+    """Move a question to a new results version so cached totals are no longer read."""
+    _cache().set(_version_key(question_id), time.time_ns(), timeout=None)
+
+
+async def aget_results(question):
+    """Return (choices, total_votes) of a question, from the cache when possible.
+
+    Choices are dicts with the id, choice_text, vote_count and percent keys.
+
+    """
+    cache = _cache()
+    key = _results_key(question.id, await aget_results_version(question.id))
+    results = await cache.aget(key)
+    if results is not None:
+        _record('hits')
+        return results
+
+    _record('misses')
+    rows = question.results().values('id', 'choice_text', 'vote_count', 'percent', 'total_votes')
+    choices = [choice async for choice in rows]
+    results = (choices, choices[0]['total_votes'] if choices else 0)
+    await cache.aset(key, results, **_replica_timeout(rows))
+    return results
+
+
+def results_cache_stats():
+    """Return the number of cache hits and misses of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_results_cache_stats():
+    """Set the hit and miss counters back to zero."""
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def bump_questions_version():
+    """Move the poll index to a new version so cached pages are no longer read."""
+    _cache().delete(QUESTIONS_VERSION_KEY)
+
+
+async def aget_questions_version(now):
+    """Return the current question-table version.
+
+    The version is stored with the time the next question opens or closes,
+    after which the version is replaced even if no question was saved.
+
+    """
+    cache = _cache()
+    state = await cache.aget(QUESTIONS_VERSION_KEY)
+    if state is None or (state[1] is not None and state[1] <= now):
+        state = (time.time_ns(), await Question.objects.anext_status_change(now))
+        await cache.aset(QUESTIONS_VERSION_KEY, state, timeout=None)
+    return state[0]
+
+
+def index_fragment_key(version, *vary_on):
+    """Return the cache key of the shared question list of the index page."""
+    return make_template_fragment_key('polls.index.questions', [version, *vary_on])
+
+
+def index_page_key(version, *vary_on):
+    """Return the cache key of the whole index page shown to anonymous visitors."""
+    return make_template_fragment_key('polls.index.page', [version, *vary_on])
+
+
+async def aget_index_cache(key):
+    """Return the cached html under a key of the poll index, or None."""
+    return await _cache().aget(key)
+
+
+async def aset_index_cache(key, html):
+    """Store html of the poll index for POLLS_INDEX_CACHE_TTL seconds."""
+    await _cache().aset(key, html, timeout=settings.POLLS_INDEX_CACHE_TTL)
@@ -0,0 +1,26 @@
+"""System checks of the polls settings."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .cache import RESULTS_CACHE_ALIAS
+
+# backends that every process keeps to itself
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_results_cache(app_configs, **kwargs):
+    """Warn if the results cache isn't shared between processes."""
+    backend = settings.CACHES.get(RESULTS_CACHE_ALIAS, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The {RESULTS_CACHE_ALIAS!r} cache uses {backend}, which every process keeps to itself.',
+        hint=('A vote only invalidates the cached results and index of the worker that took it, so '
+              'with more than one worker set RESULTS_CACHE_BACKEND to a shared cache such as Redis '
+              'or memcached.'),
+        id='polls.W001',
+    )]
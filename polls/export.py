@@ -0,0 +1,77 @@
+"""Streaming export of votes and poll results as CSV or JSON lines.
+
+Rows are read with chunked iterator() queries and written one line at a
+time, so memory use stays flat and output starts right away however many
+votes there are.
+"""
+import csv
+import json
+
+from .models import Choice, Vote
+
+CSV = 'csv'
+JSONL = 'jsonl'
+FORMATS = (CSV, JSONL)
+
+VOTES = 'votes'
+RESULTS = 'results'
+KINDS = (VOTES, RESULTS)
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    JSONL: 'application/x-ndjson',
+}
+
+
+def export_queryset(kind):
+    """Return (header, queryset of value tuples) for the votes or the results export."""
+    if kind == VOTES:
+        header = ['user', 'question_id', 'choice_id', 'voted_at']
+        rows = (Vote.objects.order_by('pk')
+                .values_list('user__username', 'question_id', 'choice_id', 'voted_at'))
+    elif kind == RESULTS:
+        header = ['question_id', 'question_text', 'choice_id', 'choice_text', 'votes']
+        rows = (Choice.objects.order_by('question_id', 'pk')
+                .values_list('question_id', 'question__question_text', 'pk', 'choice_text', 'vote_count'))
+    else:
+        raise ValueError(f'Unknown export: {kind}')
+    return header, rows
+
+
+class _Echo:
+    """A file-like object that hands back what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def _formatter(fmt, header):
+    """Return a function turning one row into one line of output."""
+    if fmt == CSV:
+        writer = csv.writer(_Echo())
+        return writer.writerow
+    if fmt == JSONL:
+        return lambda row: json.dumps(dict(zip(header, row)), default=str) + '\n'
+    raise ValueError(f'Unknown format: {fmt}')
+
+
+def stream_export(kind, fmt, chunk_size=CHUNK_SIZE):
+    """Yield the lines of an export, reading the database chunk by chunk."""
+    header, rows = export_queryset(kind)
+    line = _formatter(fmt, header)
+    if fmt == CSV:
+        yield line(header)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield line(row)
+
+
+async def astream_export(kind, fmt, chunk_size=CHUNK_SIZE):
+    """Yield the lines of an export like stream_export(), using the async ORM."""
+    header, rows = export_queryset(kind)
+    line = _formatter(fmt, header)
+    if fmt == CSV:
+        yield line(header)
+    async for row in rows.aiterator(chunk_size=chunk_size):
+        yield line(row)
@@ -0,0 +1,200 @@
+"""Bulk import of questions and their choices from CSV or JSON lines.
+
+Input is read one row at a time and written with bulk_create in batches,
+one transaction per batch, so memory use doesn't grow with the size of
+the file.
+
+JSON lines -- {"external_id": "...", "question_text": "...", "pub_date": "...",
+               "end_date": "...", "choices": ["...", ...]}
+CSV -- columns external_id, question_text, pub_date, end_date and choices,
+       the choices separated by "|"
+
+Dates are ISO 8601; dates without a time zone are in the current one.
+"""
+import csv
+import json
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import bump_questions_version
+from .models import Choice, Question
+
+CSV = 'csv'
+JSONL = 'jsonl'
+FORMATS = (CSV, JSONL)
+
+CHOICE_SEPARATOR = '|'
+
+
+class RowError(ValueError):
+    """A row of the input can't be imported."""
+
+
+def read_rows(file, fmt):
+    """Yield (line number, dict) for every row of an input file."""
+    if fmt == JSONL:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, RowError(f'invalid JSON: {error}')
+    elif fmt == CSV:
+        for number, row in enumerate(csv.DictReader(file), start=2):
+            row['choices'] = [text for text in (row.get('choices') or '').split(CHOICE_SEPARATOR) if text]
+            yield number, row
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+
+
+def _parse_date(row, name):
+    value = row.get(name)
+    try:
+        date = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        # well formed but out of range, e.g. month 13
+        date = None
+    if date is None:
+        raise RowError(f'{name} is not a valid date: {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def clean_row(row):
+    """Return (Question, [choice texts]) for a row, or raise RowError."""
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError('row is not an object')
+    text = (row.get('question_text') or '').strip()
+    if not text:
+        raise RowError('question_text is empty')
+    if len(text) > Question._meta.get_field('question_text').max_length:
+        raise RowError('question_text is too long')
+    pub_date = _parse_date(row, 'pub_date')
+    end_date = _parse_date(row, 'end_date')
+    if end_date < pub_date:
+        raise RowError('end_date is before pub_date')
+    choices = row.get('choices') or []
+    if not isinstance(choices, list) or not all(isinstance(choice, str) and choice for choice in choices):
+        raise RowError('choices must be a list of texts')
+    external_id = row.get('external_id') or None
+    question = Question(question_text=text, pub_date=pub_date, end_date=end_date,
+                        external_id=str(external_id) if external_id is not None else None)
+    return question, choices
+
+
+class Importer:
+    """Insert questions in batches, optionally updating those with a known external id."""
+
+    def __init__(self, batch_size=1000, upsert=False, report=None):
+        """Create an importer writing batch_size questions per transaction.
+
+        report(line number, message) is called for every row that is skipped.
+
+        """
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.report = report or (lambda number, message: None)
+        self.questions = 0
+        self.choices = 0
+        self.skipped = 0
+        # (line number, question, choice texts)
+        self._batch = []
+        self._batch_ids = set()
+
+    def feed(self, rows):
+        """Import (line number, row) pairs, writing a batch whenever it is full."""
+        for number, row in rows:
+            try:
+                question, choices = clean_row(row)
+            except RowError as error:
+                self._skip(number, str(error))
+                continue
+            external_id = question.external_id
+            if self.upsert and external_id is None:
+                self._skip(number, 'external_id is needed in upsert mode')
+                continue
+            if external_id is not None and external_id in self._batch_ids:
+                if not self.upsert:
+                    self._skip(number, f'external_id {external_id!r} is repeated')
+                    continue
+                # write the earlier row first, this one then updates it
+                self.flush()
+            if external_id is not None:
+                self._batch_ids.add(external_id)
+            self._batch.append((number, question, choices))
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        self.flush()
+
+    def _skip(self, number, message):
+        self.skipped += 1
+        self.report(number, message)
+
+    def flush(self):
+        """Write the questions collected so far."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        self._batch_ids = set()
+        if not self.upsert:
+            batch = self._skip_stored(batch)
+            if not batch:
+                return
+        batch = [(question, choices) for _, question, choices in batch]
+        with transaction.atomic():
+            if self.upsert:
+                self._write_upsert(batch)
+            else:
+                self._write_new(batch)
+            # bulk_create sends no post_save signals
+            transaction.on_commit(bump_questions_version)
+        self.questions += len(batch)
+
+    def _skip_stored(self, batch):
+        external_ids = [question.external_id for _, question, _ in batch if question.external_id is not None]
+        stored = set(Question.objects.filter(external_id__in=external_ids).values_list('external_id', flat=True))
+        new = []
+        for number, question, choices in batch:
+            if question.external_id in stored:
+                self._skip(number, f'external_id {question.external_id!r} is already imported, see --upsert')
+            else:
+                new.append((number, question, choices))
+        return new
+
+    def _write_new(self, batch):
+        questions = Question.objects.bulk_create([question for question, _ in batch])
+        self._add_choices([question.pk for question in questions], batch)
+
+    def _write_upsert(self, batch):
+        Question.objects.bulk_create(
+            [question for question, _ in batch],
+            update_conflicts=True,
+            unique_fields=['external_id'],
+            update_fields=['question_text', 'pub_date', 'end_date'],
+        )
+        ids = dict(Question.objects.filter(external_id__in=[question.external_id for question, _ in batch])
+                   .values_list('external_id', 'pk'))
+        self._add_choices([ids[question.external_id] for question, _ in batch], batch)
+
+    def _add_choices(self, question_ids, batch):
+        # choices already stored are kept, so votes on them survive a re-import
+        existing = defaultdict(set)
+        if self.upsert:
+            stored = Choice.objects.filter(question_id__in=question_ids).values_list('question_id', 'choice_text')
+            for question_id, text in stored:
+                existing[question_id].add(text)
+        choices = []
+        for question_id, (_, texts) in zip(question_ids, batch):
+            for text in texts:
+                if text not in existing[question_id]:
+                    existing[question_id].add(text)
+                    choices.append(Choice(question_id=question_id, choice_text=text))
+        Choice.objects.bulk_create(choices, batch_size=self.batch_size)
+        self.choices += len(choices)
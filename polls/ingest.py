@@ -0,0 +1,367 @@
+"""Write-behind ingestion of votes.
+
+When POLLS_VOTE_BUFFER is on, the vote() view validates the choice and
+hands the vote to an in-process VoteBuffer instead of writing it. A
+background thread flushes the buffer in one transaction once it holds
+POLLS_VOTE_BUFFER_MAX_SIZE votes or POLLS_VOTE_BUFFER_FLUSH_INTERVAL
+seconds have passed. Votes of the same user on the same question are
+coalesced, only the last one is written.
+
+POLLS_VOTE_BUFFER_DURABILITY decides what a crash costs:
+
+memory -- pending votes only live in memory and are lost
+journal -- every vote is appended to a journal and synced to disk before
+           vote() returns; the journal is replayed when the buffer starts
+           again
+
+Each process has its own buffer and its own journal, named after
+POLLS_VOTE_BUFFER_JOURNAL with the process id appended, and holds a lock
+file next to it while it runs. A starting buffer replays its own journal
+and those of processes that no longer hold their lock, so no process ever
+rotates or deletes the journal of a running one.
+
+Because the buffer is per process, overlay_pending_vote() only shows a
+user their pending vote when the results are served by the worker that
+took the vote; other workers show it once it is flushed.
+"""
+import atexit
+import datetime
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from mysite.sqlite import retry_on_lock
+
+from .cache import bump_results_version
+from .live import publish
+from .models import Choice, Vote, VoteEvent
+
+try:
+    import fcntl
+except ImportError:
+    # without file locks journals are only replayed by the process that wrote them
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MEMORY = 'memory'
+JOURNAL = 'journal'
+
+# number of (user, question) pairs looked up per query when flushing
+LOOKUP_BATCH_SIZE = 500
+
+
+class VoteBuffer:
+    """Collect votes in memory and write them to the database in batches."""
+
+    def __init__(self, max_size=500, flush_interval=1.0, durability=MEMORY, journal_path=None):
+        """Create an empty buffer; call start() to run the background flusher.
+
+        The journal of the buffer is journal_path with the process id appended.
+
+        """
+        if durability not in (MEMORY, JOURNAL):
+            raise ValueError(f'Unknown vote buffer durability: {durability}')
+        if durability == JOURNAL and not journal_path:
+            raise ValueError('A journal path is needed for journal durability')
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.journal_base = str(journal_path) if journal_path else None
+        self.journal_path = f'{journal_path}.{os.getpid()}' if journal_path else None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._journal = None
+        self._journal_lock = None
+
+    def add(self, user_id, question_id, choice_id):
+        """Queue a vote, replacing any pending vote of the user on the same question."""
+        voted_at = time.time()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.write(json.dumps([user_id, question_id, choice_id, voted_at]) + '\n')
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            self._pending[(user_id, question_id)] = (choice_id, voted_at)
+            if len(self._pending) >= self.max_size:
+                self._wakeup.notify()
+
+    def pending_choice(self, user_id, question_id):
+        """Return the id of the choice a user has a pending vote for, or None."""
+        with self._lock:
+            choice_id, _ = self._pending.get((user_id, question_id), (None, None))
+            return choice_id
+
+    def __len__(self):
+        """Return the number of pending votes."""
+        with self._lock:
+            return len(self._pending)
+
+    def start(self):
+        """Replay the journals left behind and start the background flusher."""
+        if self.durability == JOURNAL:
+            self._journal_lock = _lock_file(self.journal_path + '.lock')
+            self._replay_journals()
+            self._journal = open(self.journal_path, 'a')
+        self._thread = threading.Thread(target=self._run, name='vote-buffer-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write whatever is still pending."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            if not self._pending:
+                os.remove(self.journal_path)
+        if self._journal_lock is not None:
+            os.remove(self.journal_path + '.lock')
+            self._journal_lock.close()
+            self._journal_lock = None
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._lock:
+                while (not self._stopping and len(self._pending) < self.max_size
+                       and time.monotonic() < deadline):
+                    self._wakeup.wait(max(deadline - time.monotonic(), 0))
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing the vote buffer failed')
+            finally:
+                close_old_connections()
+            deadline = time.monotonic() + self.flush_interval
+
+    def flush(self):
+        """Write all pending votes in one transaction and return how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                flushing = self._rotate_journal()
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+            except Exception:
+                # put the votes back unless the user has voted again meanwhile
+                with self._lock:
+                    for key, pending in batch.items():
+                        self._pending.setdefault(key, pending)
+                    if self._journal is not None:
+                        self._write_journal(self._journal, batch)
+                raise
+            if flushing:
+                os.remove(flushing)
+            return len(batch)
+
+    @retry_on_lock
+    def _write(self, batch):
+        keys = list(batch)
+        previous = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            chunk = keys[start:start + LOOKUP_BATCH_SIZE]
+            rows = Vote.objects.filter(user_id__in={user for user, _ in chunk},
+                                       question_id__in={question for _, question in chunk})
+            for user_id, question_id, vote_id, choice_id in rows.values_list('user_id', 'question_id', 'id',
+                                                                             'choice_id'):
+                if (user_id, question_id) in batch:
+                    previous[(user_id, question_id)] = (vote_id, choice_id)
+
+        created, changed, events = [], [], []
+        deltas = defaultdict(int)
+        for (user_id, question_id), (choice_id, voted_at) in batch.items():
+            voted_at = datetime.datetime.fromtimestamp(voted_at, tz=datetime.timezone.utc)
+            if (user_id, question_id) not in previous:
+                created.append(Vote(user_id=user_id, question_id=question_id, choice_id=choice_id, voted_at=voted_at))
+                events.append(VoteEvent(question_id=question_id, new_choice_id=choice_id, voted_at=voted_at))
+                deltas[choice_id] += 1
+                continue
+            vote_id, old_choice_id = previous[(user_id, question_id)]
+            if old_choice_id != choice_id:
+                changed.append(Vote(pk=vote_id, choice_id=choice_id, voted_at=voted_at))
+                events.append(VoteEvent(question_id=question_id, old_choice_id=old_choice_id, new_choice_id=choice_id,
+                                        voted_at=voted_at))
+                deltas[choice_id] += 1
+                deltas[old_choice_id] -= 1
+
+        by_delta = defaultdict(list)
+        for choice_id, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(choice_id)
+
+        with transaction.atomic():
+            Vote.objects.bulk_create(created, batch_size=LOOKUP_BATCH_SIZE, update_conflicts=True,
+                                     unique_fields=['user', 'question'], update_fields=['choice', 'voted_at'])
+            Vote.objects.bulk_update(changed, ['choice', 'voted_at'], batch_size=LOOKUP_BATCH_SIZE)
+            VoteEvent.objects.bulk_create(events, batch_size=LOOKUP_BATCH_SIZE)
+            for delta, choice_ids in by_delta.items():
+                Choice.objects.filter(pk__in=choice_ids).update(vote_count=F('vote_count') + delta)
+            transaction.on_commit(lambda: _bump_results_versions({question_id for _, question_id in batch}))
+        logger.debug('Flushed %d buffered votes', len(batch))
+
+    def _rotate_journal(self):
+        """Move the journal aside for the batch being flushed and return its path."""
+        if self._journal is None:
+            return None
+        self._journal.close()
+        flushing = self.journal_path + '.flushing'
+        if os.path.exists(flushing):
+            # a previous flush failed and its votes were put back in the new journal
+            os.remove(flushing)
+        os.replace(self.journal_path, flushing)
+        self._journal = open(self.journal_path, 'a')
+        return flushing
+
+    @staticmethod
+    def _write_journal(journal, batch):
+        for (user_id, question_id), (choice_id, voted_at) in batch.items():
+            journal.write(json.dumps([user_id, question_id, choice_id, voted_at]) + '\n')
+        journal.flush()
+        os.fsync(journal.fileno())
+
+    def _replay_journals(self):
+        # this process's journals and those of processes that are gone
+        stems = {self.journal_path}
+        pattern = re.escape(self.journal_base) + r'\.(\d+)(?:\.\w+)?'
+        for path in glob.glob(glob.escape(self.journal_base) + '.*'):
+            match = re.fullmatch(pattern, path)
+            if match:
+                stems.add(f'{self.journal_base}.{match[1]}')
+        orphans = []
+        for stem in sorted(stems):
+            if stem != self.journal_path:
+                lock = _lock_file(stem + '.lock', wait=False)
+                if lock is None:
+                    # the process is still running
+                    continue
+                orphans.append((stem, lock))
+            for path in (stem + '.flushing', stem):
+                if os.path.exists(path):
+                    self._read_journal(path)
+        if self._pending:
+            logger.info('Replaying %d votes from the vote buffer journals', len(self._pending))
+            # keep them on disk until they are flushed
+            with open(self.journal_path + '.replay', 'w') as journal:
+                self._write_journal(journal, self._pending)
+            os.replace(self.journal_path + '.replay', self.journal_path)
+        for stem, lock in orphans:
+            for path in (stem + '.flushing', stem, stem + '.lock'):
+                if os.path.exists(path):
+                    os.remove(path)
+            lock.close()
+        if os.path.exists(self.journal_path + '.flushing'):
+            os.remove(self.journal_path + '.flushing')
+
+    def _read_journal(self, path):
+        with open(path) as journal:
+            for line in journal:
+                try:
+                    user_id, question_id, choice_id, voted_at = json.loads(line)
+                except ValueError:
+                    # a line cut short by a crash
+                    continue
+                pending = self._pending.get((user_id, question_id))
+                # journals of several processes hold the latest vote last
+                if pending is None or pending[1] <= voted_at:
+                    self._pending[(user_id, question_id)] = (choice_id, voted_at)
+
+
+def _lock_file(path, wait=True):
+    """Return the open lock file at path once it is locked, or None if wait is False and it is taken."""
+    lock = open(path, 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            lock.close()
+            return None
+    elif not wait:
+        lock.close()
+        return None
+    return lock
+
+
+def _bump_results_versions(question_ids):
+    for question_id in question_ids:
+        bump_results_version(question_id)
+        publish(question_id)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def buffering_enabled():
+    """Return True if votes should go through the write-behind buffer."""
+    return settings.POLLS_VOTE_BUFFER
+
+
+def get_vote_buffer():
+    """Return the vote buffer of this process, starting it on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer(
+                max_size=settings.POLLS_VOTE_BUFFER_MAX_SIZE,
+                flush_interval=settings.POLLS_VOTE_BUFFER_FLUSH_INTERVAL,
+                durability=settings.POLLS_VOTE_BUFFER_DURABILITY,
+                journal_path=settings.POLLS_VOTE_BUFFER_JOURNAL,
+            )
+            _buffer.start()
+            atexit.register(_buffer.stop)
+        return _buffer
+
+
+def overlay_pending_vote(choices, total_votes, user, question):
+    """Return results that include the user's vote if it is still waiting in the buffer.
+
+    `choices` are the dicts returned by polls.cache.aget_results; they are
+    copied, not changed. Only the buffer of this process is looked at, see
+    the module docstring.
+
+    """
+    if not (buffering_enabled() and user.is_authenticated):
+        return choices, total_votes
+    pending = get_vote_buffer().pending_choice(user.id, question.id)
+    if pending is None:
+        return choices, total_votes
+    stored = (Vote.objects.filter(user=user, question=question)
+              .values_list('choice_id', flat=True).first())
+    if stored == pending:
+        return choices, total_votes
+
+    choices = [dict(choice) for choice in choices]
+    if stored is None:
+        total_votes += 1
+    for choice in choices:
+        if choice['id'] == pending:
+            choice['vote_count'] += 1
+        elif choice['id'] == stored:
+            choice['vote_count'] -= 1
+    for choice in choices:
+        choice['percent'] = 100.0 * choice['vote_count'] / total_votes if total_votes else 0.0
+        choice['total_votes'] = total_votes
+    return choices, total_votes
@@ -0,0 +1,50 @@
+"""Freeze the results of closed questions.
+
+Once a question's end date has passed no vote can change its results, so
+finalize_questions() computes them one last time and stores them in a
+ResultSnapshot, which the results page reads instead of aggregating. A
+question is only finalized POLLS_FINALIZE_GRACE seconds after it closed,
+so votes still in the vote buffer have been written. Run it with the
+finalize_polls command from cron or with --loop.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import F, Q, Sum, Window
+from django.utils import timezone
+
+from .models import Choice, Question, ResultSnapshot
+
+
+def questions_to_finalize(now):
+    """Return the closed questions without a current snapshot."""
+    closed_before = now - datetime.timedelta(seconds=settings.POLLS_FINALIZE_GRACE)
+    return (Question.objects.filter(end_date__lt=closed_before)
+            .filter(Q(snapshot__isnull=True) | ~Q(snapshot__end_date=F('end_date'))))
+
+
+def finalize_questions(now=None, batch_size=500):
+    """Snapshot the results of at most batch_size closed questions and return how many."""
+    now = now or timezone.now()
+    questions = {pk: end_date for pk, end_date in
+                 questions_to_finalize(now).order_by('end_date').values_list('pk', 'end_date')[:batch_size]}
+    if not questions:
+        return 0
+    rows = (Choice.objects.filter(question_id__in=questions)
+            .annotate(total_votes=Window(Sum('vote_count'), partition_by=F('question_id')))
+            .values_list('question_id', 'id', 'choice_text', 'vote_count', 'total_votes')
+            .order_by('question_id', 'id'))
+    snapshots = {pk: ResultSnapshot(question_id=pk, end_date=end_date, total_votes=0, choices=[], created_at=now)
+                 for pk, end_date in questions.items()}
+    for question_id, choice_id, choice_text, vote_count, total in rows:
+        snapshot = snapshots[question_id]
+        snapshot.total_votes = total
+        snapshot.choices.append({
+            'id': choice_id,
+            'choice_text': choice_text,
+            'vote_count': vote_count,
+            'percent': 100.0 * vote_count / total if total else 0.0,
+        })
+    ResultSnapshot.objects.bulk_create(snapshots.values(), update_conflicts=True, unique_fields=['question'],
+                                       update_fields=['end_date', 'total_votes', 'choices', 'created_at'])
+    return len(snapshots)
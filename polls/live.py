@@ -0,0 +1,141 @@
+"""In-process publish/subscribe of poll results for live pages.
+
+Every question watched by at least one client of this process has a
+Channel running in the event loop. publish() may be called from any thread
+once a vote is committed; it only marks the channel as changed. The
+channel reads the results (through the results cache) at most once per
+POLLS_LIVE_INTERVAL seconds, however many votes arrived or clients are
+watching, and hands each subscriber the change of every choice count.
+Clients that are only watching cost no queries at all.
+"""
+import asyncio
+import logging
+import threading
+
+from django.conf import settings
+
+from .cache import aget_results
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_channels = {}
+
+
+class Subscription:
+    """Changes of the results of one question waiting to be sent to one client."""
+
+    def __init__(self, counts, total_votes):
+        """Start from the current counts."""
+        self.counts = dict(counts)
+        self.total_votes = total_votes
+        self._deltas = {}
+        self._changed = asyncio.Event()
+
+    def push(self, deltas, total_votes):
+        """Add changes, merging them with the ones not sent yet."""
+        for choice_id, delta in deltas.items():
+            self._deltas[choice_id] = self._deltas.get(choice_id, 0) + delta
+        self.total_votes = total_votes
+        self._changed.set()
+
+    async def get(self):
+        """Wait for changes and return (deltas, total_votes)."""
+        await self._changed.wait()
+        self._changed.clear()
+        deltas, self._deltas = self._deltas, {}
+        return deltas, self.total_votes
+
+
+class Channel:
+    """Reads the results of a question when they change and fans them out."""
+
+    def __init__(self, question, counts, total_votes):
+        """Create the channel of a question with its current results."""
+        self.question = question
+        self.counts = counts
+        self.total_votes = total_votes
+        self.subscribers = set()
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._task = self.loop.create_task(self._run())
+
+    def notify(self):
+        """Mark the results as changed, must be called in the channel's loop."""
+        self._changed.set()
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            # votes arriving in the meantime are read together
+            await asyncio.sleep(settings.POLLS_LIVE_INTERVAL)
+            self._changed.clear()
+            try:
+                choices, total_votes = await aget_results(self.question)
+            except Exception:
+                # keep the channel, the next vote reads the results again
+                logger.exception('Reading the live results of poll %s failed', self.question.id)
+                continue
+            counts = {choice['id']: choice['vote_count'] for choice in choices}
+            deltas = {choice_id: count - self.counts.get(choice_id, 0)
+                      for choice_id, count in counts.items() if count != self.counts.get(choice_id, 0)}
+            self.counts, self.total_votes = counts, total_votes
+            if deltas:
+                for subscriber in self.subscribers:
+                    subscriber.push(deltas, total_votes)
+
+    def close(self):
+        """Stop reading results."""
+        self._task.cancel()
+
+
+async def subscribe(question):
+    """Return a Subscription to the results of a question, starting a channel if needed."""
+    with _lock:
+        channel = _channels.get(question.id)
+    if channel is None:
+        choices, total_votes = await aget_results(question)
+        with _lock:
+            channel = _channels.get(question.id)
+            if channel is None:
+                counts = {choice['id']: choice['vote_count'] for choice in choices}
+                channel = _channels[question.id] = Channel(question, counts, total_votes)
+    subscription = Subscription(channel.counts, channel.total_votes)
+    channel.subscribers.add(subscription)
+    return subscription
+
+
+def unsubscribe(question_id, subscription):
+    """Remove a subscription, stopping the channel after the last one."""
+    with _lock:
+        channel = _channels.get(question_id)
+        if channel is None:
+            return
+        channel.subscribers.discard(subscription)
+        if not channel.subscribers:
+            del _channels[question_id]
+            channel.close()
+
+
+def publish(question_id):
+    """Tell the subscribers of a question in this process that its results changed."""
+    with _lock:
+        channel = _channels.get(question_id)
+    if channel is None:
+        return
+    try:
+        channel.loop.call_soon_threadsafe(channel.notify)
+    except RuntimeError:
+        # the loop is closed, so are the streams of the channel; the vote is
+        # committed already and must not fail because of them
+        logger.warning('Dropping the live results channel of poll %s, its event loop is closed', question_id)
+        with _lock:
+            if _channels.get(question_id) is channel:
+                del _channels[question_id]
+
+
+def subscriber_count(question_id):
+    """Return the number of clients of this process watching a question."""
+    with _lock:
+        channel = _channels.get(question_id)
+        return len(channel.subscribers) if channel else 0
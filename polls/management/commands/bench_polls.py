@@ -0,0 +1,180 @@
+import datetime
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_databases, setup_test_environment, \
+    teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+VIEWS = ('polls:index', 'polls:detail', 'polls:vote', 'polls:results')
+
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Command(BaseCommand):
+    """Measure the throughput of the voting workflow against a throwaway database."""
+
+    help = ('Seed a temporary database and drive the index, detail, vote and results pages '
+            'from concurrent clients, then print a JSON report.')
+
+    def add_arguments(self, parser):
+        """Add the size of the seed data and of the load."""
+        parser.add_argument('--questions', type=int, default=50, help='Number of questions to seed.')
+        parser.add_argument('--choices', type=int, default=4, help='Number of choices per question.')
+        parser.add_argument('--users', type=int, default=100, help='Number of users to seed.')
+        parser.add_argument('--workers', type=int, default=4, help='Number of concurrent clients.')
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Number of index, detail, vote, results rounds per worker.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random choice of users and polls.')
+        parser.add_argument('--output', help='File to write the JSON report to, stdout by default.')
+
+    def handle(self, *args, **options):
+        """Set up a temporary database, run the load and print the report."""
+        database = settings.DATABASES['default']
+        scratch = None
+        if database['ENGINE'] == 'django.db.backends.sqlite3':
+            # an in-memory test database can't take concurrent writers
+            scratch = tempfile.NamedTemporaryFile(prefix='bench_polls_', suffix='.sqlite3', delete=False)
+            scratch.close()
+            database.setdefault('TEST', {})['NAME'] = scratch.name
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            users, questions = self.seed(options)
+            report = self.run_load(users, questions, options)
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            if scratch is not None and os.path.exists(scratch.name):
+                os.remove(scratch.name)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def seed(self, options):
+        """Create the users and the open questions with their choices."""
+        password = make_password('bench-password')
+        User.objects.bulk_create(
+            [User(username=f'bench{i}', password=password) for i in range(options['users'])])
+        now = timezone.now()
+        Question.objects.bulk_create([
+            Question(question_text=f'Benchmark question {i}', pub_date=now - datetime.timedelta(days=1),
+                     end_date=now + datetime.timedelta(days=30))
+            for i in range(options['questions'])])
+        questions = {}
+        for question_id in Question.objects.values_list('pk', flat=True):
+            questions[question_id] = []
+        Choice.objects.bulk_create([
+            Choice(question_id=question_id, choice_text=f'Choice {i}')
+            for question_id in questions for i in range(options['choices'])])
+        for question_id, choice_id in Choice.objects.values_list('question_id', 'pk'):
+            questions[question_id].append(choice_id)
+        return list(User.objects.order_by('pk')), questions
+
+    def run_load(self, users, questions, options):
+        """Run the workers and return the report."""
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        question_ids = sorted(questions)
+
+        def worker(number):
+            rng = random.Random(options['seed'] * 1000 + number)
+            client = Client()
+            local = defaultdict(list)
+            local_errors = defaultdict(int)
+            try:
+                for _ in range(options['iterations']):
+                    client.force_login(rng.choice(users))
+                    question_id = rng.choice(question_ids)
+                    choice_id = rng.choice(questions[question_id])
+                    steps = [
+                        ('polls:index', 'get', reverse('polls:index'), None),
+                        ('polls:detail', 'get', reverse('polls:detail', args=(question_id,)), None),
+                        ('polls:vote', 'post', reverse('polls:vote', args=(question_id,)), {'choice': choice_id}),
+                        ('polls:results', 'get', reverse('polls:results', args=(question_id,)), None),
+                    ]
+                    for name, method, url, data in steps:
+                        with CaptureQueriesContext(connection) as queries:
+                            start = time.perf_counter()
+                            try:
+                                response = getattr(client, method)(url, data)
+                                error = f'HTTP {response.status_code}' if response.status_code >= 400 else None
+                            except Exception as exception:
+                                error = f'{type(exception).__name__}: {exception}'
+                            elapsed = time.perf_counter() - start
+                        if error:
+                            local_errors[(name, error)] += 1
+                        else:
+                            local[name].append((elapsed, len(queries)))
+            finally:
+                connection.close()
+            with lock:
+                for name, values in local.items():
+                    samples[name].extend(values)
+                for key, count in local_errors.items():
+                    errors[key] += count
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        views = {}
+        for name in VIEWS:
+            latencies = sorted(elapsed for elapsed, _ in samples[name])
+            queries = [count for _, count in samples[name]]
+            views[name] = {
+                'requests': len(latencies),
+                'errors': sum(count for (view, _), count in errors.items() if view == name),
+                'requests_per_second': round(len(latencies) / duration, 2),
+                'p50_ms': _ms(percentile(latencies, 0.50)),
+                'p95_ms': _ms(percentile(latencies, 0.95)),
+                'p99_ms': _ms(percentile(latencies, 0.99)),
+                'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+            }
+        total = sum(view['requests'] for view in views.values())
+        return {
+            'config': {key: options[key] for key in ('questions', 'choices', 'users', 'workers', 'iterations',
+                                                     'seed')},
+            'database': connection.vendor,
+            'duration_seconds': round(duration, 3),
+            'total_requests': total,
+            'requests_per_second': round(total / duration, 2),
+            'views': views,
+            'errors': {f'{view} {error}': count for (view, error), count in sorted(errors.items())},
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
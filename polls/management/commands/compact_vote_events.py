@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.timeline import ConcurrentCompaction, compact_events
+
+
+class Command(BaseCommand):
+    """Add new vote events to the per-minute and per-hour rollups."""
+
+    help = 'Roll up the vote events that are not rolled up yet, once or every --loop seconds.'
+
+    def add_arguments(self, parser):
+        """Add --batch-size and --loop options."""
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of events rolled up per transaction.')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep running, compacting again after this many seconds.')
+
+    def handle(self, *args, **options):
+        """Roll up every pending event in batches, then repeat if --loop is given."""
+        while True:
+            total = 0
+            try:
+                while count := compact_events(options['batch_size']):
+                    total += count
+            except ConcurrentCompaction as error:
+                self.stderr.write(str(error))
+            self.stdout.write(self.style.SUCCESS(f'Rolled up {total} vote event(s).'))
+            if options['loop'] is None:
+                break
+            time.sleep(options['loop'])
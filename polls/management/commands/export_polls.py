@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from polls.export import CHUNK_SIZE, CSV, FORMATS, KINDS, stream_export
+
+
+class Command(BaseCommand):
+    """Stream the votes or the per-question results to a file or stdout."""
+
+    help = 'Export votes or poll results as CSV or JSON lines.'
+
+    def add_arguments(self, parser):
+        """Add the kind of export, --format, --output and --chunk-size."""
+        parser.add_argument('kind', choices=KINDS, help='What to export.')
+        parser.add_argument('--format', choices=FORMATS, default=CSV, help='Output format.')
+        parser.add_argument('--output', help='File to write to, stdout by default.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Number of rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        """Write the export line by line."""
+        lines = stream_export(options['kind'], options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.lifecycle import finalize_questions
+
+
+class Command(BaseCommand):
+    """Store the final results of newly closed questions."""
+
+    help = 'Snapshot the results of closed questions, once or every --loop seconds.'
+
+    def add_arguments(self, parser):
+        """Add --batch-size and --loop options."""
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of questions finalized per query.')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep running, looking for closed questions again after this many seconds.')
+
+    def handle(self, *args, **options):
+        """Finalize every closed question in batches, then repeat if --loop is given."""
+        while True:
+            total = 0
+            while count := finalize_questions(batch_size=options['batch_size']):
+                total += count
+            self.stdout.write(self.style.SUCCESS(f'Finalized {total} question(s).'))
+            if options['loop'] is None:
+                break
+            time.sleep(options['loop'])
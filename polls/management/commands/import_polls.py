@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.importer import CSV, FORMATS, JSONL, Importer, read_rows
+
+
+class Command(BaseCommand):
+    """Import questions and choices from a CSV or JSON lines file."""
+
+    help = 'Import questions and their choices in batches from CSV or JSON lines.'
+
+    def add_arguments(self, parser):
+        """Add the input file, --format, --batch-size and --upsert."""
+        parser.add_argument('file', help='File to read, "-" for stdin.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format, guessed from the file extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of questions inserted per transaction.')
+        parser.add_argument('--upsert', action='store_true',
+                            help='Update questions whose external_id is already stored instead of adding them.')
+
+    def handle(self, *args, **options):
+        """Read the file row by row and import it."""
+        fmt = options['format']
+        if fmt is None:
+            fmt = CSV if options['file'].endswith('.csv') else JSONL
+        importer = Importer(batch_size=options['batch_size'], upsert=options['upsert'], report=self.report)
+        if options['file'] == '-':
+            importer.feed(read_rows(sys.stdin, fmt))
+        else:
+            try:
+                with open(options['file'], newline='') as file:
+                    importer.feed(read_rows(file, fmt))
+            except OSError as error:
+                raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.questions} question(s) and {importer.choices} choice(s), '
+            f'skipped {importer.skipped} invalid row(s).'))
+
+    def report(self, number, message):
+        """Print why a row was skipped."""
+        self.stderr.write(f'line {number}: {message}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from polls.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """Rebuild the full-text index of question texts."""
+
+    help = 'Rebuild and optimize the full-text search index of the questions.'
+
+    def handle(self, *args, **options):
+        """Rebuild the FTS5 index, or report that the database has none."""
+        if rebuild_search_index():
+            self.stdout.write(self.style.SUCCESS('Rebuilt the search index.'))
+        else:
+            self.stdout.write('This database has no full-text index, search scans the question table.')
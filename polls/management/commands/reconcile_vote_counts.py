@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from polls.cache import bump_results_version
+from polls.models import Choice, ResultSnapshot, Vote
+
+
+class Command(BaseCommand):
+    """Recompute Choice.vote_count from the Vote table and fix any drift."""
+
+    help = 'Recompute the stored vote count of every choice from the Vote table.'
+
+    def add_arguments(self, parser):
+        """Add --batch-size and --dry-run options."""
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of choices written per UPDATE batch.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the choices whose count has drifted.')
+
+    def handle(self, *args, **options):
+        """Find choices whose stored count differs from the real one and recount them in SQL."""
+        tallies = (Choice.objects.annotate(actual=Count('vote'))
+                   .values_list('pk', 'question_id', 'vote_count', 'actual')
+                   .order_by('pk'))
+        # Collect the drifted rows first: SQLite gives no isolation between a
+        # cursor that is still being read and writes on the same connection.
+        drifted = []
+        questions = set()
+        for pk, question_id, stored, actual in tallies.iterator():
+            if stored != actual:
+                self.stdout.write(f'choice {pk}: {stored} -> {actual}')
+                drifted.append(pk)
+                questions.add(question_id)
+
+        if drifted and not options['dry_run']:
+            # Count again in the UPDATE itself, so votes recorded since the
+            # counts above were read are not overwritten.
+            votes = (Vote.objects.filter(choice=OuterRef('pk')).order_by().values('choice')
+                     .annotate(total=Count('pk')).values('total'))
+            actual = Coalesce(Subquery(votes, output_field=IntegerField()), Value(0))
+            size = options['batch_size']
+            with transaction.atomic():
+                for start in range(0, len(drifted), size):
+                    Choice.objects.filter(pk__in=drifted[start:start + size]).update(vote_count=actual)
+            # finalize_polls snapshots these questions again
+            ResultSnapshot.objects.filter(question_id__in=questions).delete()
+            for question_id in questions:
+                bump_results_version(question_id)
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted choice(s).'))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_count(apps, schema_editor):
+    """Copy the current number of votes of every choice into vote_count."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    tally = (Vote.objects.filter(choice=OuterRef('pk'))
+             .order_by().values('choice').annotate(n=Count('id')).values('n'))
+    Choice.objects.update(vote_count=Coalesce(Subquery(tally), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_remove_vote_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_vote_count, migrations.RunPython.noop),
+    ]
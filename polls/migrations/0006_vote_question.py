@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill_vote_question(apps, schema_editor):
+    """Copy choice.question into every vote and keep only the latest vote of a user on a question."""
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.update(question_id=Subquery(
+        Choice.objects.filter(pk=OuterRef('choice_id')).values('question_id')[:1]))
+
+    duplicates = (Vote.objects.filter(user__isnull=False).values('user_id', 'question_id')
+                  .annotate(n=Count('id'), latest=Max('id')).filter(n__gt=1).order_by())
+    for duplicate in list(duplicates):
+        (Vote.objects.filter(user_id=duplicate['user_id'], question_id=duplicate['question_id'])
+         .exclude(pk=duplicate['latest']).delete())
+
+    tally = (Vote.objects.filter(choice=OuterRef('pk'))
+             .order_by().values('choice').annotate(n=Count('id')).values('n'))
+    Choice.objects.update(vote_count=Coalesce(Subquery(tally), 0))
+
+
+class Migration(migrations.Migration):
+
+    # PostgreSQL can't ALTER a table with pending trigger events in the same
+    # transaction as the backfill, so every operation commits on its own and
+    # only the backfill runs in a transaction.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0005_question_end_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(backfill_vote_question, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='polls_vote_one_per_user_question'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_vote_question'),
+    ]
+
+    operations = [
+        # existing votes keep a null time, only new votes get the default
+        migrations.AddField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='time voted'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True,
+                                       verbose_name='time voted'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_question_external_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(django.db.models.functions.text.Lower('question_text'),
+                               name='polls_question_text_lower_idx'),
+        ),
+    ]
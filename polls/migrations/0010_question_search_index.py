@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:50
+
+from django.db import migrations
+
+# An external content FTS5 table: it indexes polls_question.question_text
+# without storing a copy, and the triggers keep it in step with every
+# insert, update and delete, including bulk ones.
+#
+# SQLite runs most AlterField operations on polls_question by copying the
+# table, which silently drops these triggers. A migration that alters the
+# table has to create them again, see polls.search.TRIGGERS and the
+# rebuild_search_index command.
+CREATE_SQLITE = [
+    """CREATE VIRTUAL TABLE polls_question_fts USING fts5(
+        question_text, content='polls_question', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN
+        INSERT INTO polls_question_fts(rowid, question_text) VALUES (new.id, new.question_text);
+    END""",
+    """CREATE TRIGGER polls_question_fts_delete AFTER DELETE ON polls_question BEGIN
+        INSERT INTO polls_question_fts(polls_question_fts, rowid, question_text)
+        VALUES ('delete', old.id, old.question_text);
+    END""",
+    """CREATE TRIGGER polls_question_fts_update AFTER UPDATE OF question_text ON polls_question BEGIN
+        INSERT INTO polls_question_fts(polls_question_fts, rowid, question_text)
+        VALUES ('delete', old.id, old.question_text);
+        INSERT INTO polls_question_fts(rowid, question_text) VALUES (new.id, new.question_text);
+    END""",
+    "INSERT INTO polls_question_fts(polls_question_fts) VALUES ('rebuild')",
+]
+
+DROP_SQLITE = [
+    'DROP TRIGGER IF EXISTS polls_question_fts_update',
+    'DROP TRIGGER IF EXISTS polls_question_fts_delete',
+    'DROP TRIGGER IF EXISTS polls_question_fts_insert',
+    'DROP TABLE IF EXISTS polls_question_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text index on SQLite, other databases use the fallback search."""
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SQLITE:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    """Drop the full-text index and its triggers."""
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQLITE:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_question_text_lower_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
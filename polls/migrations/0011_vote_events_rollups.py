@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_question_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteRollupHour',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('voted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='time voted')),
+                ('rolled_up', models.BooleanField(default=False)),
+                ('new_choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.choice')),
+                ('old_choice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteRollupMinute',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('lost', models.PositiveIntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polls.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'bucket'], name='polls_rollup_minute_q_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='voterollupminute',
+            constraint=models.UniqueConstraint(fields=('choice', 'bucket'), name='polls_rollup_minute_choice_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='voterolluphour',
+            index=models.Index(fields=['question', 'bucket'], name='polls_rollup_hour_q_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='voterolluphour',
+            constraint=models.UniqueConstraint(fields=('choice', 'bucket'), name='polls_rollup_hour_choice_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='voteevent',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='polls_voteevent_pending_idx'),
+        ),
+    ]
@@ -2,17 +2,76 @@ import datetime
 
 import django.contrib.auth.models
 from django.db import models
+from django.db.models import F, FloatField, Sum, Window
+from django.db.models.functions import Coalesce, Lower, NullIf
 from django.utils import timezone
 
 
 # Create your models here.
 
+class QuestionQuerySet(models.QuerySet):
+    """Queries on questions that compare their dates with a single `now` in SQL."""
+
+    def published(self, now=None):
+        """Return questions whose publication date has passed."""
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open(self, now=None):
+        """Return questions that can be voted on."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__gte=now)
+
+    def closed(self, now=None):
+        """Return published questions whose end date has passed."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__lt=now)
+
+    def with_status(self, now=None):
+        """Annotate every question with its status: upcoming, open or closed."""
+        now = now or timezone.now()
+        return self.annotate(status=models.Case(
+            models.When(pub_date__gt=now, then=models.Value(Question.UPCOMING)),
+            models.When(end_date__lt=now, then=models.Value(Question.CLOSED)),
+            default=models.Value(Question.OPEN),
+            output_field=models.CharField(),
+        ))
+
+    async def anext_status_change(self, now=None):
+        """Return the next time a question opens or closes, or None."""
+        now = now or timezone.now()
+        dates = await self.aaggregate(
+            opens=models.Min('pub_date', filter=models.Q(pub_date__gt=now)),
+            closes=models.Min('end_date', filter=models.Q(end_date__gt=now)),
+        )
+        return min(filter(None, dates.values()), default=None)
+
+
 class Question(models.Model):
     """A Question model that has a question, a publication date and an end date."""
 
+    UPCOMING = 'upcoming'
+    OPEN = 'open'
+    CLOSED = 'closed'
+
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('data published')
     end_date = models.DateTimeField('end date')
+    # id of the question in the system it was imported from, see import_polls
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        """Indexes used by the index page and the admin."""
+
+        indexes = [
+            # keyset pagination of the index page
+            models.Index(fields=['pub_date', 'id'], name='polls_question_pub_id_idx'),
+            # open and closed tabs of the index page
+            models.Index(fields=['end_date'], name='polls_question_end_date_idx'),
+            # prefix search of the admin, see QuestionAdmin.get_search_results
+            models.Index(Lower('question_text'), name='polls_question_text_lower_idx'),
+        ]
 
     def __str__(self):
         """Return question with question text."""
@@ -32,6 +91,19 @@ class Question(models.Model):
         """Return True if question can be voted."""
         return self.pub_date <= timezone.now() <= self.end_date
 
+    def results(self):
+        """Return the choices annotated with the question total and their percentage of it.
+
+        Everything is computed by a single query using window functions over
+        the stored vote counts.
+
+        """
+        question_total = Window(Sum('vote_count'))
+        return self.choice_set.annotate(
+            total_votes=question_total,
+            percent=Coalesce(100.0 * F('vote_count') / NullIf(question_total, 0), 0.0, output_field=FloatField()),
+        ).order_by('pk')
+
     was_published_recently.admin_order_field = 'pub_date'
     was_published_recently.boolean = True
     was_published_recently.short_description = 'Published recently?'
@@ -40,12 +112,14 @@ class Question(models.Model):
 class Choice(models.Model):
     """A Choice model has two fields: the text of the choice and a vote tally.
 
-    Each Choice is associated with a Question.
+    Each Choice is associated with a Question. The tally is stored in
+    vote_count and kept in step with the Vote table by the vote() view.
 
     """
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         """Return choice text of each choice."""
@@ -54,23 +128,120 @@ class Choice(models.Model):
     @property
     def votes(self):
         """Return sum of the vote for a choice."""
-        return Vote.objects.filter(choice=self).count()
+        return self.vote_count
 
 
 class Vote(models.Model):
-    """A Choice model.
+    """A Vote model.
 
-    Each Choice is associated with a Question, Choices and a User.
+    Each Vote is associated with a Question, Choices and a User. The question
+    is a copy of choice.question so that a user can have only one vote per
+    question.
 
     """
 
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     user = models.ForeignKey(django.contrib.auth.models.User,
                              null=True,
                              blank=True,
                              on_delete=models.CASCADE)
+    # unknown for votes cast before this field was added
+    voted_at = models.DateTimeField('time voted', null=True, blank=True, default=timezone.now)
 
-    @property
-    def question(self):
-        """Get the question that this vote applies to."""
-        return self.choice.question
+    class Meta:
+        """One vote per user and question."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='polls_vote_one_per_user_question'),
+        ]
+
+
+class ResultSnapshot(models.Model):
+    """The final results of a closed question, written once by finalize_polls.
+
+    `choices` is a list of {"id", "choice_text", "vote_count", "percent"}
+    in choice order, like the results cache. The snapshot only applies
+    while the question still has the `end_date` it was taken for.
+
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    end_date = models.DateTimeField()
+    total_votes = models.PositiveIntegerField()
+    choices = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def is_current(self):
+        """Return True if the snapshot was taken for the question's present end date."""
+        return self.end_date == self.question.end_date
+
+
+class VoteEvent(models.Model):
+    """A vote as it was cast: the question, the choice it left (if any) and the new choice.
+
+    Events are only ever added. compact_vote_events adds them to the rollup
+    tables and marks them as rolled up.
+
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    old_choice = models.ForeignKey(Choice, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    new_choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='+')
+    voted_at = models.DateTimeField('time voted', default=timezone.now)
+    rolled_up = models.BooleanField(default=False)
+
+    class Meta:
+        """Find the events that aren't rolled up yet without scanning the others."""
+
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(rolled_up=False), name='polls_voteevent_pending_idx'),
+        ]
+
+
+class VoteRollup(models.Model):
+    """Votes of a choice during one period, starting at `bucket`.
+
+    `votes` counts the votes cast for the choice, `lost` the votes moved
+    from it to another choice.
+
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='+')
+    bucket = models.DateTimeField()
+    votes = models.PositiveIntegerField(default=0)
+    lost = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """Base of the per-minute and per-hour tables."""
+
+        abstract = True
+
+
+class VoteRollupMinute(VoteRollup):
+    """Votes per choice and minute."""
+
+    class Meta:
+        """One row per choice and minute, read by question and time."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'bucket'], name='polls_rollup_minute_choice_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'bucket'], name='polls_rollup_minute_q_idx'),
+        ]
+
+
+class VoteRollupHour(VoteRollup):
+    """Votes per choice and hour."""
+
+    class Meta:
+        """One row per choice and hour, read by question and time."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'bucket'], name='polls_rollup_hour_choice_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'bucket'], name='polls_rollup_hour_q_idx'),
+        ]
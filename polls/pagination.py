@@ -0,0 +1,67 @@
+"""Keyset (cursor) pagination of questions ordered by newest first.
+
+Pages are addressed by the (pub_date, id) of the row next to them instead
+of an OFFSET, so each page is one indexed range scan however deep the
+visitor goes. Cursors are signed so clients can't forge them.
+"""
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SALT = 'polls.pagination'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def make_cursor(direction, question):
+    """Return an opaque cursor pointing before or after the given question."""
+    return signing.dumps([direction, question.pub_date.isoformat(), question.id], salt=CURSOR_SALT, compress=True)
+
+
+def read_cursor(cursor):
+    """Return (direction, pub_date, id) of a cursor, or None if it is missing or invalid."""
+    if not cursor:
+        return None
+    try:
+        direction, pub_date, pk = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    pub_date = parse_datetime(pub_date)
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+async def apaginate_questions(queryset, cursor, per_page):
+    """Return one page of questions with the cursors of its neighbours.
+
+    Returns:
+    (questions, next_cursor, previous_cursor) -- a cursor is None if there
+    is no page in that direction.
+
+    """
+    position = read_cursor(cursor)
+    if position is None:
+        direction = NEXT
+        rows = queryset.order_by('-pub_date', '-id')
+    else:
+        direction, pub_date, pk = position
+        if direction == NEXT:
+            after = Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            rows = queryset.filter(after).order_by('-pub_date', '-id')
+        else:
+            before = Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk)
+            rows = queryset.filter(before).order_by('pub_date', 'id')
+    page = [question async for question in rows[:per_page + 1]]
+
+    has_more = len(page) > per_page
+    page = page[:per_page]
+    if direction == PREVIOUS:
+        page.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    next_cursor = make_cursor(NEXT, page[-1]) if page and has_next else None
+    previous_cursor = make_cursor(PREVIOUS, page[0]) if page and has_previous else None
+    return page, next_cursor, previous_cursor
@@ -0,0 +1,117 @@
+"""Full-text search over question texts.
+
+On SQLite, questions are found through the polls_question_fts FTS5 table
+(created by migration 0010, which also adds the triggers that keep it in
+sync) and ranked by bm25. Other databases, or an SQLite build without
+FTS5, fall back to matching every word with icontains, newest first.
+
+SQLite alters a table by copying it to a new one, which drops its
+triggers, so after a migration that alters polls_question run the
+rebuild_search_index command: it creates the triggers again.
+"""
+import re
+
+from django.db import connections, router
+
+from .models import Question
+
+FTS_TABLE = 'polls_question_fts'
+# deepest page served, so an OFFSET never has to skip too many rows
+MAX_PAGE = 50
+
+# keep polls_question_fts in step with every insert, update and delete,
+# including bulk ones; the same as in migration 0010
+TRIGGERS = {
+    'polls_question_fts_insert': f"""AFTER INSERT ON polls_question BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, question_text) VALUES (new.id, new.question_text);
+    END""",
+    'polls_question_fts_delete': f"""AFTER DELETE ON polls_question BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question_text) VALUES ('delete', old.id, old.question_text);
+    END""",
+    'polls_question_fts_update': f"""AFTER UPDATE OF question_text ON polls_question BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question_text) VALUES ('delete', old.id, old.question_text);
+        INSERT INTO {FTS_TABLE}(rowid, question_text) VALUES (new.id, new.question_text);
+    END""",
+}
+
+# whether the database with this name has the index, looked up once
+_available = {}
+
+
+def search_terms(query):
+    """Return the words of a search query."""
+    return re.findall(r'\w+', query.lower())
+
+
+def fts_available(using=None):
+    """Return True if the database questions are read from (or `using`) has the FTS5 question index."""
+    connection = connections[using or router.db_for_read(Question)]
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        _available[name] = FTS_TABLE in connection.introspection.table_names()
+    return _available[name]
+
+
+def search_questions(query, now, page=1, per_page=20):
+    """Return one page of published questions matching a query, best match first.
+
+    Every word of the query has to match the start of a word of the
+    question text, or any part of it with the fallback search.
+
+    Returns:
+    (questions, has_next) -- the questions are annotated with their status.
+
+    """
+    terms = search_terms(query)
+    if not terms or not 1 <= page <= MAX_PAGE:
+        return [], False
+    offset = (page - 1) * per_page
+    # the ids and the questions come from the same database
+    using = router.db_for_read(Question)
+    if fts_available(using):
+        ids = _fts_ids(using, terms, now, offset, per_page + 1)
+        found = Question.objects.using(using).with_status(now).in_bulk(ids[:per_page])
+        return [found[pk] for pk in ids[:per_page] if pk in found], len(ids) > per_page
+
+    questions = Question.objects.using(using).published(now).with_status(now)
+    for term in terms:
+        questions = questions.filter(question_text__icontains=term)
+    rows = list(questions.order_by('-pub_date', '-id')[offset:offset + per_page + 1])
+    return rows[:per_page], len(rows) > per_page
+
+
+def match_expression(terms):
+    """Return the FTS5 query matching questions with a word starting with every term."""
+    # quoted terms are never read as FTS5 operators, * matches word prefixes
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _fts_ids(using, terms, now, offset, limit):
+    match = match_expression(terms)
+    sql = (f'SELECT q.id FROM {FTS_TABLE} f JOIN polls_question q ON q.id = f.rowid '
+           f'WHERE {FTS_TABLE} MATCH %s AND q.pub_date <= %s ORDER BY f.rank LIMIT %s OFFSET %s')
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, connection.ops.adapt_datetimefield_value(now), limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild_search_index():
+    """Create the triggers of the full-text index again and rebuild it from the question table.
+
+    Returns:
+    False if there is no full-text index to rebuild.
+
+    """
+    using = router.db_for_write(Question)
+    if not fts_available(using):
+        return False
+    with connections[using].cursor() as cursor:
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'CREATE TRIGGER {name} {body}')
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return True
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_questions_version, bump_results_version
+from .models import Choice, Question
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def questions_changed(sender, **kwargs):
+    """Invalidate the cached poll index when a question or choice changes.
+
+    The version is bumped again after commit, in case another request cached
+    the index before the change became visible to it.
+
+    """
+    bump_questions_version()
+    transaction.on_commit(bump_questions_version)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choices_changed(sender, instance, **kwargs):
+    """Invalidate the cached results of a question when one of its choices changes."""
+    question_id = instance.question_id
+    bump_results_version(question_id)
+    transaction.on_commit(lambda: bump_results_version(question_id))
@@ -0,0 +1,93 @@
+import datetime
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import search
+from polls.admin import CappedCountPaginator, QuestionAdmin
+from polls.models import Question, Vote
+
+
+def create_question(question_text, start_days, end_days):
+    """Create a question published and ending the given number of days from now."""
+    return Question.objects.create(question_text=question_text,
+                                   pub_date=timezone.now() + datetime.timedelta(days=start_days),
+                                   end_date=timezone.now() + datetime.timedelta(days=end_days))
+
+
+class AdminTests(TestCase):
+    """Tests for the question and vote admin."""
+
+    def setUp(self):
+        """Create questions with votes and log in a superuser."""
+        self.admin = User.objects.create_superuser(username='admin', password='secret')
+        self.client.force_login(self.admin)
+        self.open = create_question('Open question', -1, 5)
+        self.closed = create_question('closed question', -5, -1)
+        self.choice = self.open.choice_set.create(choice_text='yes', vote_count=2)
+        self.open.choice_set.create(choice_text='no', vote_count=1)
+        Vote.objects.create(user=self.admin, question=self.open, choice=self.choice)
+
+    def test_question_changelist(self):
+        """The changelist shows the status and total votes annotated in SQL."""
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        rows = {question.pk: question for question in response.context['cl'].result_list}
+        self.assertEqual((rows[self.open.pk].status, rows[self.open.pk].total_votes), ('open', 3))
+        self.assertEqual((rows[self.closed.pk].status, rows[self.closed.pk].total_votes), ('closed', 0))
+
+    def test_queries_do_not_grow(self):
+        """The changelist runs the same queries for more questions."""
+        url = reverse('admin:polls_question_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for n in range(20):
+            create_question(f'Question {n}', -1, 5)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(url)
+
+    def search(self, term):
+        """Return the questions found by the changelist search for a term."""
+        response = self.client.get(reverse('admin:polls_question_changelist'), {'q': term})
+        return set(response.context['cl'].result_list)
+
+    def test_search(self):
+        """Search finds questions containing the term anywhere, ignoring case."""
+        self.assertEqual(self.search('CLOSED'), {self.closed})
+        self.assertEqual(self.search('question'), {self.open, self.closed})
+        self.assertEqual(self.search('uestio'), {self.open, self.closed})
+        self.assertEqual(self.search('sushi'), set())
+
+    def test_search_uses_index(self):
+        """Words are looked up in the full-text index, or as a range of the lower-cased text index."""
+        request = RequestFactory().get('/')
+        request.user = self.admin
+        model_admin = QuestionAdmin(Question, site)
+        queryset, _ = model_admin.get_search_results(request, Question.objects.all(), 'open')
+        plan = queryset.explain()
+        if search.fts_available():
+            self.assertIn(search.FTS_TABLE, plan)
+        with mock.patch('polls.admin.fts_available', return_value=False):
+            queryset, _ = model_admin.get_search_results(request, Question.objects.all(), 'open')
+        if connection.vendor == 'sqlite':
+            self.assertIn('polls_question_text_lower_idx', queryset.explain())
+
+    def test_capped_count(self):
+        """The paginator stops counting at COUNT_LIMIT."""
+        paginator = CappedCountPaginator(Question.objects.order_by('pk'), 1)
+        paginator.COUNT_LIMIT = 1
+        self.assertEqual(paginator.count, 1)
+
+    def test_vote_admin_read_only(self):
+        """Votes can be listed but not added, changed or deleted."""
+        response = self.client.get(reverse('admin:polls_vote_changelist'))
+        self.assertContains(response, 'Open question')
+        self.assertEqual(self.client.get(reverse('admin:polls_vote_add')).status_code, 403)
+        response = self.client.post(reverse('admin:polls_vote_delete', args=(self.open.vote_set.get().pk,)))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,91 @@
+import datetime
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import RESULTS_CACHE_ALIAS
+from polls.models import Question
+from polls.voting import record_vote
+
+
+def create_question(question_text, start_days, end_days):
+    """
+    Create a question with the given `question_text`.
+
+    Published the given number of `days` offset to now
+
+    Negative for questions published in the past
+
+    Positive for questions that have yet to be published
+
+    """
+    start_time = timezone.now() + datetime.timedelta(days=start_days)
+    end_time = timezone.now() + datetime.timedelta(days=end_days)
+
+    return Question.objects.create(question_text=question_text, pub_date=start_time, end_date=end_time)
+
+
+class ResultsApiTests(TestCase):
+    """Tests for the batch JSON results API."""
+
+    def setUp(self):
+        """Create two published questions with votes and an unpublished one."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.first = create_question(question_text='First', start_days=-2, end_days=2)
+        self.first.choice_set.create(choice_text='a', vote_count=1)
+        self.first.choice_set.create(choice_text='b', vote_count=3)
+        self.second = create_question(question_text='Second', start_days=-2, end_days=2)
+        self.second.choice_set.create(choice_text='c', vote_count=2)
+        self.future = create_question(question_text='Future', start_days=2, end_days=4)
+        self.future.choice_set.create(choice_text='d', vote_count=2)
+        self.url = reverse('polls:api_results')
+
+    def get(self, ids, **headers):
+        """Request the results of the given question ids."""
+        return self.client.get(self.url, {'ids': ','.join(str(i) for i in ids)}, **headers)
+
+    def test_results_of_many_questions(self):
+        """Totals and percentages of every requested question come back in one query."""
+        with self.assertNumQueries(1):
+            response = self.get([self.second.id, self.first.id])
+        results = response.json()['results']
+        self.assertEqual([r['question_text'] for r in results], ['Second', 'First'])
+        self.assertEqual(results[1]['total_votes'], 4)
+        self.assertEqual([c['percent'] for c in results[1]['choices']], [25.0, 75.0])
+
+    def test_unpublished_question_hidden(self):
+        """Questions that aren't published yet are left out."""
+        response = self.get([self.future.id])
+        self.assertEqual(response.json()['results'], [])
+
+    def test_not_modified(self):
+        """A client sending the current ETag gets a 304 until a vote changes the results."""
+        etag = self.get([self.first.id])['ETag']
+        with self.assertNumQueries(0):
+            response = self.get([self.first.id], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_vote(User.objects.create_user(username='minion12'), self.first.choice_set.first())
+        self.assertEqual(self.get([self.first.id], HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_choice_change_is_modified(self):
+        """Renaming a choice changes the ETag and Last-Modified even without a vote."""
+        response = self.get([self.first.id])
+        choice = self.first.choice_set.get(choice_text='a')
+        choice.choice_text = 'A'
+        with mock.patch('polls.cache.time.time_ns', return_value=time.time_ns() + 10 ** 10):
+            with self.captureOnCommitCallbacks(execute=True):
+                choice.save()
+        self.assertEqual(self.get([self.first.id], HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(
+            self.get([self.first.id], HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200)
+
+    def test_invalid_ids(self):
+        """Ids that aren't numbers are a bad request."""
+        response = self.client.get(self.url, {'ids': '1,abc'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,58 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import RESULTS_CACHE_ALIAS
+from polls.models import Question, Vote
+
+
+class AsyncViewTests(TestCase):
+    """Tests for the views served through the ASGI handler."""
+
+    def setUp(self):
+        """Initialize a question with one choice and a logged in user."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.question = Question.objects.create(
+            question_text='Select a number',
+            pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=7)
+        )
+        self.choice = self.question.choice_set.create(choice_text='1')
+        self.user = User.objects.create_user(username='minion12', password='banana123', first_name='minion')
+        self.async_client.force_login(self.user)
+
+    async def test_index(self):
+        """The index page greets the logged in user and lists the question."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, 'Welcome, minion')
+        self.assertContains(response, 'Select a number')
+
+    async def test_detail(self):
+        """The detail page lists the choices of the question."""
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, 'value=" 1"')
+
+    async def test_vote_and_results(self):
+        """A vote is recorded and the results page shows it."""
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                                {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(await Vote.objects.filter(user=self.user).acount(), 1)
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total_votes'], 1)
+
+    async def test_vote_needs_login(self):
+        """An anonymous vote is redirected to the login page."""
+        response = await AsyncClient().post(reverse('polls:vote', args=(self.question.id,)),
+                                            {'choice': self.choice.id})
+        self.assertRedirects(response, f"/accounts/login/?next={reverse('polls:vote', args=(self.question.id,))}",
+                             fetch_redirect_response=False)
+
+    async def test_missing_question(self):
+        """A question that doesn't exist is a 404."""
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id + 1,)))
+        self.assertEqual(response.status_code, 404)
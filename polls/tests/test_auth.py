@@ -1,7 +1,11 @@
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from mysite.auth import CachedModelBackend, _users, clear_user_cache
+from polls.cache import RESULTS_CACHE_ALIAS
+
 
 class AuthenticationTest(TestCase):
     """Test for authentication."""
@@ -41,3 +45,51 @@ class AuthenticationTest(TestCase):
         response2 = self.client.get(reverse('polls:index'))
         self.assertFalse(response2.context['user'].is_authenticated)
         self.assertNotContains(response2, f"Welcome, {self.credentials['first_name']}")
+
+
+class UserCacheTests(TestCase):
+    """Tests for the cached session and user lookups."""
+
+    def setUp(self):
+        """Create and log in a user, with empty caches."""
+        clear_user_cache()
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user(username='cached', password='secret', first_name='Cachey')
+        self.client.force_login(self.user)
+
+    def test_no_auth_queries(self):
+        """Once the session and user are cached a page view makes no queries."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Welcome, Cachey')
+
+    def test_copies(self):
+        """Every lookup returns its own copy of the cached user."""
+        backend = CachedModelBackend()
+        first = backend.get_user(self.user.pk)
+        first.first_name = 'Changed'
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(self.user.pk).first_name, 'Cachey')
+
+    def test_saving_invalidates(self):
+        """A saved user is loaded again."""
+        self.client.get(reverse('polls:index'))
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertContains(self.client.get(reverse('polls:index')), 'Welcome, Renamed')
+
+    def test_logout_invalidates(self):
+        """Logging out drops the user from the cache."""
+        self.client.get(reverse('polls:index'))
+        self.assertIn(self.user.pk, _users)
+        self.client.post(reverse('logout'))
+        self.assertNotIn(self.user.pk, _users)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_disabled(self):
+        """With a TTL of 0 every lookup reads the database."""
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            backend.get_user(self.user.pk)
@@ -0,0 +1,19 @@
+from django.test import SimpleTestCase
+
+from polls.management.commands.bench_polls import percentile
+
+
+class PercentileTests(SimpleTestCase):
+    """Tests for the latency percentiles of the benchmark report."""
+
+    def test_nearest_rank(self):
+        """Percentiles are taken by nearest rank."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+
+    def test_small_samples(self):
+        """A single sample is every percentile and no sample has none."""
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertIsNone(percentile([], 0.5))
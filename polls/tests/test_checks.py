@@ -0,0 +1,17 @@
+from django.test import SimpleTestCase, override_settings
+
+from polls.checks import check_results_cache
+
+
+class ResultsCacheCheckTests(SimpleTestCase):
+    """Tests for the deployment check of the results cache."""
+
+    @override_settings(CACHES={'results': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache(self):
+        """A LocMemCache results cache is reported."""
+        self.assertEqual([warning.id for warning in check_results_cache(None)], ['polls.W001'])
+
+    @override_settings(CACHES={'results': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache(self):
+        """A shared results cache passes."""
+        self.assertEqual(check_results_cache(None), [])
@@ -1,10 +1,12 @@
 import datetime
+from django.contrib.auth.models import User
 from django.test import TestCase
 
 from django.urls import reverse
 from django.utils import timezone
 
-from polls.models import Question
+from mysite.auth import clear_user_cache
+from polls.models import Question, Vote
 
 
 def create_question(question_text, start_days, end_days):
@@ -40,3 +42,42 @@ class QuestionDetailViewTests(TestCase):
         url = reverse('polls:detail', args=(past_question.id,))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
+
+
+class QuestionDetailLoadingTests(TestCase):
+    """Tests for loading the question, choices and vote of the detail page."""
+
+    def setUp(self):
+        """Create an open question with two choices and a user who voted for the second."""
+        clear_user_cache()
+        self.question = create_question(question_text='Open question.', start_days=-1, end_days=5)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.user = User.objects.create_user(username='voter', password='secret')
+        Vote.objects.create(user=self.user, question=self.question, choice=self.second)
+        self.client.force_login(self.user)
+
+    def test_two_queries(self):
+        """The page loads the question, choices and vote in two queries."""
+        url = reverse('polls:detail', args=(self.question.id,))
+        # load the session and the user into their caches
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([choice.choice_text for choice in response.context['question'].choices], ['First', 'Second'])
+        self.assertEqual(response.context['question'].selected_choice_id, self.second.id)
+        self.assertContains(response, "Second -- Can't select the same vote !")
+        self.assertNotContains(response, "First -- Can't")
+
+    def test_vote_error_shows_selected_choice(self):
+        """Voting without a choice redisplays the form with the user's vote disabled."""
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)))
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+        self.assertContains(response, "Second -- Can't select the same vote !")
+
+    def test_anonymous(self):
+        """An anonymous visitor has no selected choice."""
+        self.client.logout()
+        response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertIsNone(response.context['question'].selected_choice_id)
+        self.assertNotContains(response, "Can't select")
@@ -0,0 +1,61 @@
+import datetime
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Vote
+
+
+class ExportTests(TestCase):
+    """Tests for the vote and results exports."""
+
+    def setUp(self):
+        """Initialize a question with a vote on one of its two choices."""
+        self.question = Question.objects.create(
+            question_text='Select a number',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=7)
+        )
+        self.choice = self.question.choice_set.create(choice_text='1', vote_count=1)
+        self.question.choice_set.create(choice_text='2')
+        self.user = User.objects.create_user(username='minion12', password='banana123')
+        Vote.objects.create(user=self.user, question=self.question, choice=self.choice)
+
+    def test_command_votes_csv(self):
+        """export_polls votes writes a CSV header and one line per vote."""
+        out = StringIO()
+        call_command('export_polls', 'votes', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'user,question_id,choice_id,voted_at')
+        self.assertTrue(lines[1].startswith(f'minion12,{self.question.id},{self.choice.id},'))
+        self.assertEqual(len(lines), 2)
+
+    def test_command_results_jsonl(self):
+        """export_polls results --format jsonl writes one JSON object per choice."""
+        out = StringIO()
+        call_command('export_polls', 'results', '--format', 'jsonl', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['votes'] for row in rows], [1, 0])
+        self.assertEqual(rows[0]['question_text'], 'Select a number')
+
+    def test_endpoint_staff_only(self):
+        """Users who aren't staff are sent to the admin login page."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('polls:export', args=('votes', 'csv')))
+        self.assertEqual(response.status_code, 302)
+
+    def test_endpoint_streams(self):
+        """Staff get the export as a streaming download."""
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('polls:export', args=('results', 'csv')))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="results.csv"')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Select a number', content)
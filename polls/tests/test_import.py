@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from polls.models import Choice, Question
+
+
+def write_file(directory, name, content):
+    """Write content to a file in directory and return its path."""
+    path = os.path.join(directory, name)
+    with open(path, 'w', newline='') as file:
+        file.write(content)
+    return path
+
+
+def jsonl(*rows):
+    """Return rows as JSON lines."""
+    return ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+class ImportPollsTests(TestCase):
+    """Tests for the import_polls command."""
+
+    def setUp(self):
+        """Create a directory for the input files."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_import(self, name, content, *args):
+        """Import content from a file called name and return (stdout, stderr)."""
+        out, err = StringIO(), StringIO()
+        call_command('import_polls', write_file(self.directory.name, name, content), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl(self):
+        """Questions and choices of a JSON lines file are stored in batches."""
+        rows = [{'question_text': f'Question {i}', 'pub_date': '2020-01-01T00:00:00',
+                 'end_date': '2020-02-01T00:00:00', 'choices': ['yes', 'no']} for i in range(5)]
+        out, _ = self.run_import('polls.jsonl', jsonl(*rows), '--batch-size', '2')
+        self.assertEqual(Question.objects.count(), 5)
+        self.assertEqual(Choice.objects.count(), 10)
+        self.assertIn('Imported 5 question(s) and 10 choice(s)', out)
+
+    def test_csv(self):
+        """A CSV file with "|" separated choices is imported."""
+        content = ('external_id,question_text,pub_date,end_date,choices\n'
+                   'q1,Favourite colour?,2020-01-01 00:00,2020-02-01 00:00,red|green|blue\n')
+        self.run_import('polls.csv', content)
+        question = Question.objects.get(external_id='q1')
+        self.assertEqual([c.choice_text for c in question.choice_set.order_by('pk')], ['red', 'green', 'blue'])
+
+    def test_invalid_rows_skipped(self):
+        """Rows with an end date before their publication date or bad JSON are reported and skipped."""
+        content = jsonl({'question_text': 'Backwards', 'pub_date': '2020-02-01T00:00:00',
+                         'end_date': '2020-01-01T00:00:00'}) + '{not json\n'
+        out, err = self.run_import('polls.jsonl', content)
+        self.assertFalse(Question.objects.exists())
+        self.assertIn('line 1: end_date is before pub_date', err)
+        self.assertIn('line 2: invalid JSON', err)
+        self.assertIn('skipped 2 invalid row(s)', out)
+
+    def test_upsert_is_idempotent(self):
+        """Importing the same file twice with --upsert updates instead of duplicating."""
+        row = {'external_id': 'q1', 'question_text': 'Old text', 'pub_date': '2020-01-01T00:00:00',
+               'end_date': '2020-02-01T00:00:00', 'choices': ['yes']}
+        self.run_import('polls.jsonl', jsonl(row), '--upsert')
+        row.update(question_text='New text', choices=['yes', 'no'])
+        self.run_import('polls.jsonl', jsonl(row), '--upsert')
+        question = Question.objects.get()
+        self.assertEqual(question.question_text, 'New text')
+        self.assertEqual(sorted(c.choice_text for c in question.choice_set.all()), ['no', 'yes'])
+
+    def test_out_of_range_date_and_non_object_rows_skipped(self):
+        """A date such as month 13 and a JSON line that is not an object are reported, not raised."""
+        content = jsonl({'question_text': 'Month 13', 'pub_date': '2020-13-01T00:00:00',
+                         'end_date': '2020-02-01T00:00:00'}, ['not', 'an', 'object'])
+        out, err = self.run_import('polls.jsonl', content)
+        self.assertFalse(Question.objects.exists())
+        self.assertIn("line 1: pub_date is not a valid date: '2020-13-01T00:00:00'", err)
+        self.assertIn('line 2: row is not an object', err)
+        self.assertIn('skipped 2 invalid row(s)', out)
+
+    def test_duplicate_external_ids_reported(self):
+        """Without --upsert, repeated and already imported external ids are reported and skipped."""
+        row = {'external_id': 'q1', 'question_text': 'First', 'pub_date': '2020-01-01T00:00:00',
+               'end_date': '2020-02-01T00:00:00', 'choices': ['yes']}
+        self.run_import('polls.jsonl', jsonl(row))
+        second = dict(row, external_id='q2', question_text='Second')
+        out, err = self.run_import('polls.jsonl', jsonl(row, second, second))
+        self.assertEqual(sorted(Question.objects.values_list('question_text', flat=True)), ['First', 'Second'])
+        self.assertIn("line 1: external_id 'q1' is already imported", err)
+        self.assertIn("line 3: external_id 'q2' is repeated", err)
+        self.assertIn('Imported 1 question(s) and 1 choice(s), skipped 2 invalid row(s)', out)
+
+    def test_upsert_repeated_external_id_in_file(self):
+        """With --upsert, a later row for the same external id updates the earlier one."""
+        row = {'external_id': 'q1', 'question_text': 'Old text', 'pub_date': '2020-01-01T00:00:00',
+               'end_date': '2020-02-01T00:00:00', 'choices': ['yes']}
+        self.run_import('polls.jsonl', jsonl(row, dict(row, question_text='New text')), '--upsert')
+        self.assertEqual(Question.objects.get().question_text, 'New text')
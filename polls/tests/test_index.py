@@ -1,9 +1,13 @@
 # Create your tests here.
 import datetime
+from unittest import mock
 
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
+from polls.cache import RESULTS_CACHE_ALIAS
 from polls.models import Question
 from django.urls import reverse
 
@@ -28,6 +32,10 @@ def create_question(question_text, start_days, end_days):
 class QuestionIndexViewTests(TestCase):
     """Tests for Question Index View."""
 
+    def setUp(self):
+        """Start with an empty index cache."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
@@ -41,7 +49,8 @@ class QuestionIndexViewTests(TestCase):
         response = self.client.get(reverse('polls:index'))
         self.assertQuerysetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'],
+            transform=repr,
         )
 
     def test_future_question(self):
@@ -49,7 +58,8 @@ class QuestionIndexViewTests(TestCase):
         future_question = create_question(question_text="Future question.", start_days=3, end_days=5)
         response = self.client.get(reverse('polls:index'))
         self.assertIs(future_question.can_vote(), False)
-        self.assertQuerysetEqual(response.context['latest_question_list'], ['<Question: Future question.>'])
+        self.assertContains(response, "No polls are available.")
+        self.assertQuerysetEqual(response.context['latest_question_list'], [])
 
     def test_future_question_and_past_question(self):
         """Even if both past and future questions exist, only past questions are displayed."""
@@ -58,7 +68,8 @@ class QuestionIndexViewTests(TestCase):
         response = self.client.get(reverse('polls:index'))
         self.assertQuerysetEqual(
             response.context['latest_question_list'],
-            ['<Question: Future question.>', '<Question: Past question.>'],
+            ['<Question: Past question.>'],
+            transform=repr,
         )
         self.assertIs(past_question.can_vote(), False)
         self.assertIs(future_question.can_vote(), False)
@@ -70,5 +81,146 @@ class QuestionIndexViewTests(TestCase):
         response = self.client.get(reverse('polls:index'))
         self.assertQuerysetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question 2.>', '<Question: Past question 1.>']
+            ['<Question: Past question 2.>', '<Question: Past question 1.>'],
+            transform=repr,
         )
+
+    def test_status_tabs(self):
+        """The open and closed tabs only list questions with that status."""
+        create_question(question_text="Open question.", start_days=-1, end_days=1)
+        create_question(question_text="Closed question.", start_days=-5, end_days=-3)
+        create_question(question_text="Future question.", start_days=3, end_days=5)
+        response = self.client.get(reverse('polls:index'), {'status': 'open'})
+        self.assertQuerysetEqual(response.context['latest_question_list'], ['<Question: Open question.>'],
+                                 transform=repr)
+        response = self.client.get(reverse('polls:index'), {'status': 'closed'})
+        self.assertQuerysetEqual(response.context['latest_question_list'], ['<Question: Closed question.>'],
+                                 transform=repr)
+
+    def test_status_is_annotated(self):
+        """Every listed question carries the status computed by the database."""
+        create_question(question_text="Open question.", start_days=-1, end_days=1)
+        create_question(question_text="Closed question.", start_days=-5, end_days=-3)
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual([q.status for q in response.context['latest_question_list']], ['open', 'closed'])
+
+
+@override_settings(POLLS_PER_PAGE=2)
+class QuestionIndexPaginationTests(TestCase):
+    """Tests for the cursor pagination of the index page."""
+
+    def setUp(self):
+        """Create five questions, newest last."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.questions = [create_question(question_text=f'Question {i}.', start_days=i - 10, end_days=5)
+                          for i in range(5)]
+
+    def page(self, cursor=None):
+        """Return the context of the index page at the given cursor."""
+        data = {'cursor': cursor} if cursor else {}
+        return self.client.get(reverse('polls:index'), data).context
+
+    def test_walk_forward_and_back(self):
+        """Following next and previous cursors visits every question once, in order."""
+        first = self.page()
+        self.assertEqual([q.question_text for q in first['latest_question_list']], ['Question 4.', 'Question 3.'])
+        self.assertIsNone(first['previous_cursor'])
+        second = self.page(first['next_cursor'])
+        self.assertEqual([q.question_text for q in second['latest_question_list']], ['Question 2.', 'Question 1.'])
+        last = self.page(second['next_cursor'])
+        self.assertEqual([q.question_text for q in last['latest_question_list']], ['Question 0.'])
+        self.assertIsNone(last['next_cursor'])
+        back = self.page(last['previous_cursor'])
+        self.assertEqual([q.question_text for q in back['latest_question_list']], ['Question 2.', 'Question 1.'])
+        self.assertIsNotNone(back['next_cursor'])
+        self.assertIsNotNone(back['previous_cursor'])
+
+    def test_same_pub_date(self):
+        """Questions sharing a publication date are split across pages without loss."""
+        Question.objects.update(pub_date=timezone.now() - datetime.timedelta(days=1))
+        seen = []
+        cursor = None
+        while True:
+            context = self.page(cursor)
+            seen += [q.id for q in context['latest_question_list']]
+            cursor = context['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(q.id for q in self.questions))
+
+    def test_invalid_cursor(self):
+        """A tampered cursor shows the first page."""
+        context = self.page('not-a-cursor')
+        self.assertEqual([q.question_text for q in context['latest_question_list']], ['Question 4.', 'Question 3.'])
+
+    def test_constant_queries(self):
+        """A deep page costs the same single query as the first one."""
+        # plus one to find when the next question opens or closes
+        with self.assertNumQueries(2):
+            context = self.page()
+        with self.assertNumQueries(1):
+            self.page(context['next_cursor'])
+
+
+class QuestionIndexCacheTests(TestCase):
+    """Tests for the cached question list and page of the index."""
+
+    def setUp(self):
+        """Create an open question and a user."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.question = create_question(question_text='Cached question.', start_days=-1, end_days=5)
+        self.user = User.objects.create_user(username='voter', password='secret')
+
+    def test_anonymous_page_cached(self):
+        """A second anonymous visit is served from the page cache without queries."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Cached question.')
+
+    def test_made_up_cursors_share_the_first_page(self):
+        """Invalid cursors are served the cached first page instead of filling the cache."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'), {'cursor': 'made-up'})
+        self.assertContains(response, 'Cached question.')
+
+    def test_question_list_shared(self):
+        """Logged in users share the cached question list but see their own header."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Cached question.')
+        self.assertContains(response, 'Logout')
+        self.assertNotContains(response, 'disabled')
+
+    def test_anonymous_vote_disabled(self):
+        """Anonymous visitors get the list with disabled vote buttons."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('polls:index'))
+        self.client.logout()
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'disabled')
+
+    def test_saving_a_question_invalidates(self):
+        """Adding or changing a question shows up on the next visit."""
+        self.client.get(reverse('polls:index'))
+        create_question(question_text='New question.', start_days=-1, end_days=5)
+        self.assertContains(self.client.get(reverse('polls:index')), 'New question.')
+        self.question.question_text = 'Renamed question.'
+        self.question.save()
+        self.assertContains(self.client.get(reverse('polls:index')), 'Renamed question.')
+        self.question.delete()
+        self.assertNotContains(self.client.get(reverse('polls:index')), 'Renamed question.')
+
+    def test_opening_a_question_invalidates(self):
+        """A question that opens after the page was cached shows up once it opens."""
+        Question.objects.filter(pk=self.question.pk).update(pub_date=timezone.now() + datetime.timedelta(seconds=1))
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.assertNotContains(self.client.get(reverse('polls:index')), 'Cached question.')
+        Question.objects.filter(pk=self.question.pk).update(pub_date=timezone.now() - datetime.timedelta(seconds=1))
+        # update() sends no signal, the version expires at the old publication date
+        later = timezone.now() + datetime.timedelta(seconds=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertContains(self.client.get(reverse('polls:index')), 'Cached question.')
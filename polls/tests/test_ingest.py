@@ -0,0 +1,118 @@
+import datetime
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import ingest
+from polls.ingest import JOURNAL, VoteBuffer
+from polls.cache import RESULTS_CACHE_ALIAS
+from polls.models import Question, Vote
+
+
+class VoteBufferTests(TestCase):
+    """Tests for the write-behind vote buffer."""
+
+    def setUp(self):
+        """Initialize a question with two choices and a user."""
+        self.question = Question.objects.create(
+            question_text='Select a number',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=7)
+        )
+        self.first = self.question.choice_set.create(choice_text='1')
+        self.second = self.question.choice_set.create(choice_text='2')
+        self.user = User.objects.create_user(username='minion12', password='banana123')
+
+    def test_coalesce_last_vote(self):
+        """Only the last of several buffered votes on a question is written."""
+        buffer = VoteBuffer()
+        buffer.add(self.user.id, self.question.id, self.first.id)
+        buffer.add(self.user.id, self.question.id, self.second.id)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 1))
+        self.assertEqual(len(buffer), 0)
+
+    def test_flush_changes_stored_vote(self):
+        """A buffered vote replaces the stored vote and moves the counts."""
+        buffer = VoteBuffer()
+        buffer.add(self.user.id, self.question.id, self.first.id)
+        buffer.flush()
+        buffer.add(self.user.id, self.question.id, self.second.id)
+        buffer.flush()
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 1))
+
+    def test_journal_replay(self):
+        """Votes still in the journal of a stopped process are written by the next buffer."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'votes.journal')
+            with open(f'{path}.999999', 'w') as journal:
+                journal.write(f'[{self.user.id}, {self.question.id}, {self.first.id}, 1600000000.0]\n')
+            buffer = VoteBuffer(flush_interval=60, durability=JOURNAL, journal_path=path)
+            buffer.start()
+            self.assertEqual(buffer.pending_choice(self.user.id, self.question.id), self.first.id)
+            self.assertFalse(os.path.exists(f'{path}.999999'))
+            buffer.stop()
+            self.assertEqual(Vote.objects.get(user=self.user).choice, self.first)
+            self.assertEqual(os.listdir(directory), [])
+
+    @skipUnless(ingest.fcntl, 'file locks are not available')
+    def test_journal_of_running_process_kept(self):
+        """The journal of a process that still holds its lock is neither replayed nor rotated."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'votes.journal')
+            with open(f'{path}.999999', 'w') as journal:
+                journal.write(f'[{self.user.id}, {self.question.id}, {self.first.id}, 1600000000.0]\n')
+            running = ingest._lock_file(f'{path}.999999.lock')
+            self.addCleanup(running.close)
+            buffer = VoteBuffer(flush_interval=60, durability=JOURNAL, journal_path=path)
+            buffer.start()
+            buffer.add(self.user.id, self.question.id, self.second.id)
+            buffer.stop()
+            self.assertEqual(Vote.objects.get(user=self.user).choice, self.second)
+            with open(f'{path}.999999') as journal:
+                self.assertIn(str(self.first.id), journal.read())
+
+
+@override_settings(POLLS_VOTE_BUFFER=True)
+class BufferedVoteViewTests(TestCase):
+    """Tests for the vote and results views with the vote buffer turned on."""
+
+    def setUp(self):
+        """Install an unstarted buffer and log a user in."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.buffer = ingest._buffer = VoteBuffer()
+        self.question = Question.objects.create(
+            question_text='Select a number',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=7)
+        )
+        self.choice = self.question.choice_set.create(choice_text='1')
+        self.client.force_login(User.objects.create_user(username='minion12', password='banana123'))
+
+    def tearDown(self):
+        """Remove the buffer of this test."""
+        ingest._buffer = None
+
+    def test_vote_is_buffered(self):
+        """A vote is queued, shown on the user's results page and written on flush."""
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Vote.objects.exists())
+
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total_votes'], 1)
+
+        self.buffer.flush()
+        self.assertTrue(Vote.objects.filter(choice=self.choice).exists())
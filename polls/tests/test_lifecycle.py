@@ -0,0 +1,98 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import RESULTS_CACHE_ALIAS
+from polls.lifecycle import finalize_questions
+from polls.models import Choice, Question, ResultSnapshot, Vote
+
+
+def create_question(question_text, start_days, end_days):
+    """Create a question published and ending the given number of days from now."""
+    return Question.objects.create(question_text=question_text,
+                                   pub_date=timezone.now() + datetime.timedelta(days=start_days),
+                                   end_date=timezone.now() + datetime.timedelta(days=end_days))
+
+
+@override_settings(POLLS_FINALIZE_GRACE=60)
+class FinalizeTests(TestCase):
+    """Tests for freezing the results of closed questions."""
+
+    def setUp(self):
+        """Create a closed question with votes and an open one."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.closed = create_question('Closed?', -5, -1)
+        self.yes = self.closed.choice_set.create(choice_text='yes', vote_count=3)
+        self.no = self.closed.choice_set.create(choice_text='no', vote_count=1)
+        self.open = create_question('Open?', -1, 5)
+        self.open.choice_set.create(choice_text='maybe', vote_count=2)
+
+    def test_finalize(self):
+        """Closed questions get a snapshot of their results, once."""
+        self.assertEqual(finalize_questions(), 1)
+        self.assertEqual(finalize_questions(), 0)
+        snapshot = ResultSnapshot.objects.get()
+        self.assertEqual(snapshot.question, self.closed)
+        self.assertEqual(snapshot.total_votes, 4)
+        self.assertEqual(snapshot.choices, [
+            {'id': self.yes.id, 'choice_text': 'yes', 'vote_count': 3, 'percent': 75.0},
+            {'id': self.no.id, 'choice_text': 'no', 'vote_count': 1, 'percent': 25.0},
+        ])
+
+    def test_grace_period(self):
+        """A question that closed less than POLLS_FINALIZE_GRACE seconds ago waits."""
+        just_closed = create_question('Just closed?', -1, 0)
+        self.assertEqual(finalize_questions(now=just_closed.end_date + datetime.timedelta(seconds=30)), 1)
+        self.assertFalse(ResultSnapshot.objects.filter(question=just_closed).exists())
+        self.assertEqual(finalize_questions(now=just_closed.end_date + datetime.timedelta(seconds=61)), 1)
+
+    def test_new_end_date(self):
+        """A question closing again at another end date is finalized again."""
+        finalize_questions()
+        self.closed.end_date -= datetime.timedelta(hours=1)
+        self.closed.save()
+        self.assertEqual(finalize_questions(), 1)
+        self.assertEqual(ResultSnapshot.objects.get().end_date, self.closed.end_date)
+
+    def test_results_from_snapshot(self):
+        """The results page of a finalized question is read from the snapshot alone."""
+        finalize_questions()
+        Choice.objects.filter(pk=self.yes.pk).update(vote_count=100)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('polls:results', args=(self.closed.id,)))
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertContains(response, '75.0%')
+        self.assertNotContains(response, 'EventSource')
+
+    def test_stale_snapshot_ignored(self):
+        """A snapshot taken for another end date is not used."""
+        finalize_questions()
+        Question.objects.filter(pk=self.closed.pk).update(end_date=timezone.now() + datetime.timedelta(days=1))
+        Choice.objects.filter(pk=self.yes.pk).update(vote_count=5)
+        response = self.client.get(reverse('polls:results', args=(self.closed.id,)))
+        self.assertEqual(response.context['total_votes'], 6)
+
+    def test_closed_question_rejects_votes(self):
+        """Votes on a closed question are not recorded."""
+        self.client.force_login(User.objects.create_user(username='late', password='secret'))
+        response = self.client.post(reverse('polls:vote', args=(self.closed.id,)), {'choice': self.yes.id})
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertFalse(Vote.objects.exists())
+
+    def test_reconcile_drops_snapshot(self):
+        """Fixing the vote counts of a finalized question drops its snapshot."""
+        finalize_questions()
+        call_command('reconcile_vote_counts', stdout=StringIO())
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_command(self):
+        """finalize_polls reports the questions it finalized."""
+        out = StringIO()
+        call_command('finalize_polls', stdout=out)
+        self.assertIn('Finalized 1 question(s).', out.getvalue())
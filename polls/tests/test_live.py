@@ -0,0 +1,118 @@
+import asyncio
+import datetime
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import live
+from polls.cache import RESULTS_CACHE_ALIAS, aget_results
+from polls.models import Question
+from polls.voting import record_vote
+
+
+def parse_event(chunk):
+    """Return (name, data) of a server-sent event."""
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines() if not line.startswith('retry'))
+    return fields['event'], json.loads(fields['data'])
+
+
+@override_settings(POLLS_LIVE_INTERVAL=0)
+class LiveResultsTests(TestCase):
+    """Tests for the live results stream."""
+
+    def setUp(self):
+        """Create a question with two choices and three users."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        self.question = Question.objects.create(
+            question_text='Live?', pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1))
+        self.yes = self.question.choice_set.create(choice_text='yes')
+        self.no = self.question.choice_set.create(choice_text='no')
+        self.users = [User.objects.create_user(username=f'watcher{n}') for n in range(3)]
+
+    async def vote(self, user, choice):
+        """Vote and run the after-commit callbacks."""
+        def commit():
+            with self.captureOnCommitCallbacks(execute=True):
+                record_vote(user, choice)
+        await sync_to_async(commit)()
+
+    @override_settings(POLLS_LIVE_MAX_AGE=1)
+    async def test_stream(self):
+        """The stream starts with the counts, sends the changes and ends after POLLS_LIVE_MAX_AGE."""
+        await self.vote(self.users[0], self.yes)
+        response = await self.async_client.get(reverse('polls:live_results', args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content
+        self.assertEqual(parse_event(await anext(events)),
+                         ('counts', {'choices': {str(self.yes.id): 1, str(self.no.id): 0}, 'total_votes': 1}))
+        await self.vote(self.users[0], self.no)
+        self.assertEqual(parse_event(await anext(events)),
+                         ('delta', {'choices': {str(self.yes.id): -1, str(self.no.id): 1}, 'total_votes': 1}))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+        self.assertEqual(live.subscriber_count(self.question.id), 0)
+
+    @override_settings(POLLS_LIVE_INTERVAL=0.2)
+    async def test_coalesced(self):
+        """A burst of votes is read once and reaches every subscriber as one change."""
+        with mock.patch('polls.live.aget_results', wraps=aget_results) as results:
+            subscriptions = [await live.subscribe(self.question) for _ in range(100)]
+            self.assertEqual(results.call_count, 1)
+            for user in self.users:
+                await self.vote(user, self.yes)
+            for subscription in subscriptions:
+                deltas, total_votes = await asyncio.wait_for(subscription.get(), 1)
+                self.assertEqual(deltas, {self.yes.id: 3})
+                self.assertEqual(total_votes, 3)
+            self.assertEqual(results.call_count, 2)
+        for subscription in subscriptions:
+            live.unsubscribe(self.question.id, subscription)
+        self.assertEqual(live.subscriber_count(self.question.id), 0)
+
+    async def test_survives_errors(self):
+        """A failed read of the results is logged and the channel keeps running."""
+        failures = [RuntimeError('cache down')]
+
+        async def fail_once(question):
+            if failures:
+                raise failures.pop()
+            return await aget_results(question)
+
+        subscription = await live.subscribe(self.question)
+        with mock.patch('polls.live.aget_results', side_effect=fail_once) as results:
+            with self.assertLogs('polls.live', 'ERROR'):
+                await self.vote(self.users[0], self.yes)
+                await asyncio.sleep(0.05)
+            await self.vote(self.users[1], self.yes)
+            deltas, total_votes = await asyncio.wait_for(subscription.get(), 1)
+            self.assertEqual(results.call_count, 2)
+        self.assertEqual(deltas, {self.yes.id: 2})
+        live.unsubscribe(self.question.id, subscription)
+
+    def test_publish_to_closed_loop(self):
+        """A channel whose event loop is closed is dropped instead of failing the vote."""
+        loop = asyncio.new_event_loop()
+        loop.close()
+        live._channels[self.question.id] = mock.Mock(loop=loop)
+        self.addCleanup(live._channels.pop, self.question.id, None)
+        with self.assertLogs('polls.live', 'WARNING'):
+            live.publish(self.question.id)
+        self.assertEqual(live.subscriber_count(self.question.id), 0)
+
+    def test_wsgi_sends_counts(self):
+        """Without ASGI the endpoint only sends the current counts."""
+        response = self.client.get(reverse('polls:live_results', args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(parse_event(response.content)[0], 'counts')
+
+    def test_missing_question(self):
+        """A question that doesn't exist is a 404."""
+        response = self.client.get(reverse('polls:live_results', args=(self.question.id + 1,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,95 @@
+import copy
+import json
+import logging
+import logging.config
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from mysite.log import JsonFormatter, QueueFileHandler
+
+
+class QueueFileHandlerTests(SimpleTestCase):
+    """Tests for the background file handler and the JSON formatter."""
+
+    def setUp(self):
+        """Create a logger writing through a QueueFileHandler to a temporary file."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'polls.log')
+        self.handler = QueueFileHandler(self.path)
+        self.logger = logging.getLogger('polls.tests.queue')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def read(self):
+        """Close the handler, which writes what is queued, and return the lines of the file."""
+        self.handler.close()
+        with open(self.path) as file:
+            return file.read().splitlines()
+
+    def test_records_reach_the_file(self):
+        """Records are formatted and written by the listener thread."""
+        self.handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.logger.info('voted on poll %s', 3)
+        self.assertEqual(self.read(), ['INFO voted on poll 3'])
+
+    def test_arguments_are_merged_by_the_caller(self):
+        """Arguments are turned into text before the record is queued."""
+        class Mutable:
+            value = 'before'
+
+            def __str__(self):
+                return self.value
+
+        argument = Mutable()
+        self.logger.info('value %s', argument)
+        argument.value = 'after'
+        self.assertEqual(self.read(), ['value before'])
+
+    def test_json_lines(self):
+        """The JSON formatter writes one object per line with the structured fields."""
+        self.handler.setFormatter(JsonFormatter())
+        self.logger.info('voted', extra={'question_id': 3, 'user_id': 7})
+        entry = json.loads(self.read()[0])
+        self.assertEqual(entry['message'], 'voted')
+        self.assertEqual((entry['question_id'], entry['user_id']), (3, 7))
+        self.assertEqual(entry['level'], 'INFO')
+
+    def test_other_handlers_see_the_original_record(self):
+        """Handlers after this one still get the arguments and the exception of the record."""
+        records = []
+        collector = logging.Handler()
+        collector.emit = records.append
+        self.logger.addHandler(collector)
+        self.addCleanup(self.logger.removeHandler, collector)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.exception('value %s', 3)
+        self.assertEqual((records[0].msg, records[0].args), ('value %s', (3,)))
+        self.assertIsNotNone(records[0].exc_info)
+
+
+class LoggingSettingsTests(SimpleTestCase):
+    """Tests for the LOGGING setting."""
+
+    def test_dict_config(self):
+        """The LOGGING setting configures the polls logger to write through the queue."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'polls.log')
+        config = copy.deepcopy(settings.LOGGING)
+        config['handlers']['file']['filename'] = path
+        logging.config.dictConfig(config)
+        self.addCleanup(logging.config.dictConfig, settings.LOGGING)
+        handler = logging.getLogger('polls').handlers[0]
+        self.assertIsInstance(handler, QueueFileHandler)
+        logging.getLogger('polls.tests').info('configured')
+        handler.close()
+        with open(path) as file:
+            self.assertIn('configured', file.read())
@@ -0,0 +1,46 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mysite.metrics import registry
+from polls.models import Question
+
+
+class MetricsTests(TestCase):
+    """Tests for the per-view metrics and the /metrics endpoint."""
+
+    def setUp(self):
+        """Start from empty metrics with one question and a staff user."""
+        registry.reset()
+        Question.objects.create(question_text='Select a number', pub_date=timezone.now(),
+                                end_date=timezone.now() + datetime.timedelta(days=7))
+        self.staff = User.objects.create_user(username='admin', password='secret', is_staff=True)
+
+    def test_requests_are_recorded_per_view(self):
+        """Requests are counted under the URL name of their view, with their queries."""
+        self.client.get(reverse('polls:index'))
+        self.client.get(reverse('polls:index'))
+        text = registry.render()
+        self.assertIn('polls_request_duration_seconds_count{view="polls:index"} 2', text)
+        self.assertIn('polls_request_db_queries_sum{view="polls:index"} 2.0', text)
+
+    @override_settings(METRICS_QUERY_BUDGET=1)
+    def test_query_budget(self):
+        """A request running more queries than the budget is flagged."""
+        self.client.force_login(self.staff)
+        with self.assertLogs('mysite.metrics', 'WARNING'):
+            self.client.get(reverse('polls:index'))
+        self.assertIn('polls_request_over_query_budget_total{view="polls:index"} 1', registry.render())
+
+    def test_endpoint_staff_only(self):
+        """Only staff can read /metrics, in the Prometheus text format."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+        self.client.force_login(self.staff)
+        self.client.get(reverse('polls:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(response, '# TYPE polls_request_duration_seconds histogram')
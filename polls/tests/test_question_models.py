@@ -62,3 +62,13 @@ class QuestionModelTests(TestCase):
         time = timezone.now() + datetime.timedelta(hours=-3)
         recent_question = Question(pub_date=time, end_date=time + datetime.timedelta(days=1))
         self.assertIs(recent_question.can_vote(), True)
+
+    def test_with_status(self):
+        """with_status() labels questions the same way as is_published() and can_vote()."""
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        Question.objects.create(question_text='upcoming', pub_date=now + day, end_date=now + 2 * day)
+        Question.objects.create(question_text='open', pub_date=now - day, end_date=now + day)
+        Question.objects.create(question_text='closed', pub_date=now - 2 * day, end_date=now - day)
+        statuses = dict(Question.objects.with_status(now).values_list('question_text', 'status'))
+        self.assertEqual(statuses, {'upcoming': 'upcoming', 'open': 'open', 'closed': 'closed'})
@@ -0,0 +1,116 @@
+import datetime
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import RESULTS_CACHE_ALIAS, aget_results, reset_results_cache_stats, results_cache_stats
+from polls.models import Question
+
+# fetching the question and fetching its aggregated choices
+RESULTS_QUERY_BUDGET = 2
+
+
+def create_question(question_text, start_days, end_days):
+    """
+    Create a question with the given `question_text`.
+
+    Published the given number of `days` offset to now
+
+    Negative for questions published in the past
+
+    Positive for questions that have yet to be published
+
+    """
+    start_time = timezone.now() + datetime.timedelta(days=start_days)
+    end_time = timezone.now() + datetime.timedelta(days=end_days)
+
+    return Question.objects.create(question_text=question_text, pub_date=start_time, end_date=end_time)
+
+
+class QuestionResultsViewTests(TestCase):
+    """Tests for Question Results View."""
+
+    def setUp(self):
+        """Start every test with an empty results cache."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+
+    def test_totals_and_percentages(self):
+        """The results page shows per-choice votes, their percentage and the question total."""
+        question = create_question(question_text='Select a number', start_days=-1, end_days=1)
+        question.choice_set.create(choice_text='one', vote_count=1)
+        question.choice_set.create(choice_text='two', vote_count=3)
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertEqual([c['percent'] for c in response.context['choices']], [25.0, 75.0])
+        self.assertContains(response, '75.0%')
+
+    def test_no_votes(self):
+        """A question without votes shows zero percent instead of failing."""
+        question = create_question(question_text='Select a number', start_days=-1, end_days=1)
+        question.choice_set.create(choice_text='one')
+        response = self.client.get(reverse('polls:results', args=(question.id,)))
+        self.assertEqual(response.context['total_votes'], 0)
+        self.assertContains(response, '0.0%')
+
+    def test_query_budget(self):
+        """The number of queries doesn't depend on the number of choices."""
+        for count in (1, 25):
+            question = create_question(question_text=f'{count} choices', start_days=-1, end_days=1)
+            for i in range(count):
+                question.choice_set.create(choice_text=str(i), vote_count=i)
+            with self.assertNumQueries(RESULTS_QUERY_BUDGET):
+                self.client.get(reverse('polls:results', args=(question.id,)))
+
+
+class ResultsCacheTests(TestCase):
+    """Tests for the versioned results cache."""
+
+    def setUp(self):
+        """Initialize a question with one choice and a logged in user."""
+        caches[RESULTS_CACHE_ALIAS].clear()
+        reset_results_cache_stats()
+        self.question = create_question(question_text='Select a number', start_days=-1, end_days=1)
+        self.choice = self.question.choice_set.create(choice_text='1')
+        self.client.force_login(User.objects.create_user(username='minion12', password='banana123'))
+
+    def test_hit_and_miss(self):
+        """The second read of the same results is served from the cache."""
+        async_to_sync(aget_results)(self.question)
+        with self.assertNumQueries(0):
+            async_to_sync(aget_results)(self.question)
+        self.assertEqual(results_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_vote_invalidates_results(self):
+        """After a vote is committed the results page shows the new total."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.assertEqual(self.client.get(url).context['total_votes'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.assertEqual(self.client.get(url).context['total_votes'], 1)
+
+    async def test_evicted_version_is_not_reused(self):
+        """Losing the version counter never brings back an older cached entry."""
+        await aget_results(self.question)
+        await caches[RESULTS_CACHE_ALIAS].adelete(f'results:version:{self.question.id}')
+        await self.question.choice_set.aupdate(vote_count=3)
+        choices, total = await aget_results(self.question)
+        self.assertEqual(total, 3)
+
+    def test_choice_changes_invalidate_results(self):
+        """Adding, renaming or deleting a choice shows up on the results page."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self.question.choice_set.create(choice_text='2')
+        self.assertEqual(len(self.client.get(url).context['choices']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.choice_text = 'two'
+            other.save()
+        self.assertIn('two', [choice['choice_text'] for choice in self.client.get(url).context['choices']])
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(len(self.client.get(url).context['choices']), 1)
@@ -0,0 +1,61 @@
+import datetime
+import time
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mysite.routers import STICKY_COOKIE, ReplicaRouter, StickyPrimaryMiddleware, replica_reads
+from polls.models import Question
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTests(TestCase):
+    """Tests for the read replica router."""
+
+    def setUp(self):
+        """Create a router."""
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self):
+        """Reads outside replica_reads() use the primary."""
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_replica_reads(self):
+        """Reads inside replica_reads() use a replica, writes never do."""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Question), 'replica1')
+            self.assertEqual(self.router.db_for_write(Question), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Without replicas everything uses the primary."""
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_sticky_cookie_pins_reads(self):
+        """A client with a valid sticky cookie reads from the primary."""
+        seen = []
+
+        def view(request):
+            with replica_reads():
+                seen.append(self.router.db_for_read(Question))
+
+        middleware = StickyPrimaryMiddleware(view)
+        request = RequestFactory().get('/')
+        request.COOKIES[STICKY_COOKIE] = str(int(time.time()) + 5)
+        middleware(request)
+        request.COOKIES[STICKY_COOKIE] = str(int(time.time()) - 1)
+        middleware(request)
+        self.assertEqual(seen, [None, 'replica1'])
+
+    def test_vote_sets_sticky_cookie(self):
+        """Voting sets the cookie that keeps the voter on the primary."""
+        question = Question.objects.create(question_text='Select a number', pub_date=timezone.now(),
+                                           end_date=timezone.now() + datetime.timedelta(days=7))
+        choice = question.choice_set.create(choice_text='1')
+        self.client.force_login(User.objects.create_user(username='minion12', password='banana123'))
+        response = self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
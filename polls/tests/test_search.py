@@ -0,0 +1,117 @@
+import datetime
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls import search
+from polls.models import Question
+
+
+def create_question(question_text, start_days=-1, end_days=5):
+    """Create a question published and ending the given number of days from now."""
+    return Question.objects.create(question_text=question_text,
+                                   pub_date=timezone.now() + datetime.timedelta(days=start_days),
+                                   end_date=timezone.now() + datetime.timedelta(days=end_days))
+
+
+class SearchTests(TestCase):
+    """Tests for the question search."""
+
+    def setUp(self):
+        """Create a few questions."""
+        self.short = create_question('Best pizza?')
+        self.long = create_question('Which pizza place near the campus has the shortest queue at lunch?')
+        self.other = create_question('Favourite programming language?')
+
+    def find(self, query, **kwargs):
+        """Return the texts of the questions found for a query."""
+        questions, _ = search.search_questions(query, timezone.now(), **kwargs)
+        return [question.question_text for question in questions]
+
+    def test_index_exists(self):
+        """The FTS5 index is created on SQLite only."""
+        self.assertEqual(search.fts_available(), connection.vendor == 'sqlite')
+
+    def triggers(self):
+        """Return the names of the triggers on the question table."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'polls_question'")
+            return {row[0] for row in cursor.fetchall()}
+
+    @skipUnless(connection.vendor == 'sqlite', 'the full-text index is SQLite only')
+    def test_triggers_survive_migrations(self):
+        """No migration after 0010 dropped the triggers that keep the index in sync."""
+        self.assertEqual(self.triggers(), set(search.TRIGGERS))
+
+    def test_ranked(self):
+        """The best match comes first and every word has to match."""
+        self.assertEqual(self.find('pizza'), ['Best pizza?', self.long.question_text])
+        self.assertEqual(self.find('pizza campus'), [self.long.question_text])
+        self.assertEqual(self.find('PROGRAM'), ['Favourite programming language?'])
+
+    def test_kept_in_sync(self):
+        """Updated, deleted and bulk created questions are found accordingly."""
+        self.other.question_text = 'Favourite pizza language?'
+        self.other.save()
+        self.assertIn('Favourite pizza language?', self.find('pizza'))
+        self.short.delete()
+        self.assertNotIn('Best pizza?', self.find('pizza'))
+        now = timezone.now()
+        Question.objects.bulk_create([Question(question_text='Bulk pizza', pub_date=now, end_date=now)])
+        self.assertIn('Bulk pizza', self.find('pizza'))
+        Question.objects.filter(question_text='Bulk pizza').update(question_text='Bulk pasta')
+        self.assertEqual(self.find('pasta'), ['Bulk pasta'])
+
+    def test_unpublished_hidden(self):
+        """Questions that aren't published yet are not found."""
+        create_question('Future pizza?', start_days=2)
+        self.assertNotIn('Future pizza?', self.find('pizza'))
+
+    def test_pages(self):
+        """Results are split into pages."""
+        questions, has_next = search.search_questions('pizza', timezone.now(), page=1, per_page=1)
+        self.assertEqual((len(questions), has_next), (1, True))
+        questions, has_next = search.search_questions('pizza', timezone.now(), page=2, per_page=1)
+        self.assertEqual((len(questions), has_next), (1, False))
+        self.assertEqual(self.find('pizza', page=search.MAX_PAGE + 1), [])
+
+    def test_operators_are_words(self):
+        """Quotes and FTS5 operators in the query are treated as plain text."""
+        self.assertEqual(self.find('"best" -pizza* ('), ['Best pizza?'])
+        self.assertEqual(self.find('***'), [])
+
+    def test_fallback(self):
+        """Without the FTS5 index every word is matched anywhere in the text."""
+        with mock.patch('polls.search.fts_available', return_value=False):
+            self.assertEqual(self.find('pizza campus'), [self.long.question_text])
+            self.assertEqual(self.find('izz'), [self.long.question_text, 'Best pizza?'])
+
+    def test_view(self):
+        """The search page lists the matching questions."""
+        response = self.client.get(reverse('polls:search'), {'q': 'pizza'})
+        self.assertContains(response, 'Best pizza?')
+        self.assertNotContains(response, 'Favourite programming language?')
+        response = self.client.get(reverse('polls:search'), {'q': 'sushi'})
+        self.assertContains(response, 'No polls match your search.')
+
+    def test_rebuild_command(self):
+        """rebuild_search_index rebuilds the index."""
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Rebuilt the search index.', out.getvalue())
+        self.assertEqual(self.find('pizza'), ['Best pizza?', self.long.question_text])
+
+    @skipUnless(connection.vendor == 'sqlite', 'the full-text index is SQLite only')
+    def test_rebuild_creates_triggers(self):
+        """rebuild_search_index brings back triggers dropped by a table rebuild."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER polls_question_fts_insert')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.triggers(), set(search.TRIGGERS))
+        create_question('Pizza again?')
+        self.assertIn('Pizza again?', self.find('pizza'))
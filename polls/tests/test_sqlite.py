@@ -0,0 +1,185 @@
+import datetime
+import os
+import tempfile
+import threading
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from mysite.sqlite import retry_on_lock
+from polls.models import Choice, Question, Vote
+from polls.voting import record_vote
+
+
+@override_settings(SQLITE_CONCURRENCY_MODE=True, SQLITE_BUSY_TIMEOUT=1234)
+class ConcurrencyModeTests(SimpleTestCase):
+    """Tests for the SQLite connection settings."""
+
+    def test_pragmas(self):
+        """A new SQLite connection uses WAL, the busy timeout and synchronous=NORMAL."""
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(tmp, 'wal.sqlite3')}, 'wal')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 1234)
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+
+class RetryOnLockTests(SimpleTestCase):
+    """Tests for retry_on_lock."""
+
+    def test_retries_lock_errors(self):
+        """A function failing with a lock error is called again until it succeeds."""
+        calls = []
+
+        @retry_on_lock(attempts=3, base_delay=0)
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        self.assertEqual(write(), 'done')
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up(self):
+        """The last lock error is raised after all attempts."""
+        calls = []
+
+        @retry_on_lock(attempts=2, base_delay=0)
+        def write():
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 2)
+
+    def test_other_errors_are_not_retried(self):
+        """Errors other than lock errors are raised at once."""
+        calls = []
+
+        @retry_on_lock(attempts=5, base_delay=0)
+        def write():
+            calls.append(1)
+            raise OperationalError('no such table: polls_vote')
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(SQLITE_CONCURRENCY_MODE=True, DATABASE_LOCK_RETRIES=50)
+class ConcurrentVoteTests(TransactionTestCase):
+    """Stress test of many users voting at the same time.
+
+    The test runner's in-memory database never takes WAL or the busy
+    timeout, so like bench_polls the test runs on a temporary database file.
+
+    """
+
+    writers = 8
+    voters_per_writer = 10
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the default database at a migrated temporary file."""
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.memory_connection = connections['default']
+        cls.memory_settings = connections.settings['default']
+        # threads open their connections from connections.settings
+        connections.settings['default'] = {**cls.memory_settings,
+                                           'NAME': os.path.join(cls.directory.name, 'votes.sqlite3')}
+        connections['default'] = DatabaseWrapper(connections.settings['default'], 'default')
+        call_command('migrate', verbosity=0, interactive=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Go back to the in-memory test database."""
+        connections['default'].close()
+        connections['default'] = cls.memory_connection
+        connections.settings['default'] = cls.memory_settings
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_no_lost_votes(self):
+        """Every vote of concurrent writers is saved and counted."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+        now = timezone.now()
+        question = Question.objects.create(question_text='Busy?', pub_date=now - datetime.timedelta(days=1),
+                                           end_date=now + datetime.timedelta(days=1))
+        choices = [Choice.objects.create(question=question, choice_text=text) for text in ('yes', 'no')]
+        users = User.objects.bulk_create(
+            User(username=f'voter{n}') for n in range(self.writers * self.voters_per_writer))
+        errors = []
+
+        def vote(users):
+            try:
+                for n, user in enumerate(users):
+                    record_vote(user, choices[n % 2])
+                    # change some of the votes to the other choice
+                    if n % 3 == 0:
+                        record_vote(user, choices[(n + 1) % 2])
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=vote, args=(users[n::self.writers],)) for n in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.filter(question=question).count(), len(users))
+        for choice in choices:
+            choice.refresh_from_db()
+            self.assertEqual(choice.vote_count, Vote.objects.filter(choice=choice).count())
+        self.assertEqual(sum(choice.vote_count for choice in choices), len(users))
+
+    def test_same_user_first_votes(self):
+        """First votes of one user submitted at the same time are stored and counted once."""
+        now = timezone.now()
+        question = Question.objects.create(question_text='Twice?', pub_date=now - datetime.timedelta(days=1),
+                                           end_date=now + datetime.timedelta(days=1))
+        choices = [Choice.objects.create(question=question, choice_text=text) for text in ('yes', 'no')]
+        users = User.objects.bulk_create(User(username=f'double{n}') for n in range(self.voters_per_writer))
+        errors = []
+
+        def vote(user, choice, barrier):
+            try:
+                barrier.wait()
+                record_vote(user, choice)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        for user in users:
+            barrier = threading.Barrier(self.writers)
+            threads = [threading.Thread(target=vote, args=(user, choices[n % 2], barrier))
+                       for n in range(self.writers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.filter(question=question).count(), len(users))
+        for choice in choices:
+            choice.refresh_from_db()
+            self.assertEqual(choice.vote_count, Vote.objects.filter(choice=choice).count())
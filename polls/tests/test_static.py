@@ -0,0 +1,118 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from mysite import static
+
+
+class StaticFilesTests(SimpleTestCase):
+    """Tests for collectstatic and serving the collected files."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Collect the static files into a temporary STATIC_ROOT."""
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.root)
+        settings = override_settings(STATIC_ROOT=cls.root)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as file:
+            cls.manifest = json.load(file)['paths']
+
+    def test_hashed_names(self):
+        """Collected files get hashed names which the static tag uses."""
+        hashed = self.manifest['polls/style.css']
+        self.assertNotEqual(hashed, 'polls/style.css')
+        self.assertEqual(staticfiles_storage.url('polls/style.css'), '/static/' + hashed)
+        with open(os.path.join(self.root, hashed)) as file:
+            self.assertIn(self.manifest['polls/images/background.jpeg'].split('/')[-1], file.read())
+
+    def test_gzip_variant(self):
+        """Text files get a gzip copy with the same content."""
+        hashed = os.path.join(self.root, self.manifest['polls/style.css'])
+        with open(hashed, 'rb') as file, gzip.open(hashed + '.gz') as compressed:
+            self.assertEqual(compressed.read(), file.read())
+
+    @skipUnless(static.brotli, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Clients accepting brotli get the brotli copy."""
+        url = '/static/' + self.manifest['polls/style.css']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        with open(os.path.join(self.root, self.manifest['polls/style.css']), 'rb') as file:
+            self.assertEqual(static.brotli.decompress(b''.join(response.streaming_content)), file.read())
+
+    def test_serve_hashed_file(self):
+        """A hashed file is served compressed with an immutable Cache-Control header."""
+        url = '/static/' + self.manifest['polls/style.css']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], static.IMMUTABLE)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_serve_plain_file(self):
+        """Without Accept-Encoding the file is sent as is, and names without a hash are not immutable."""
+        response = self.client.get('/static/polls/style.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_refused_encodings(self):
+        """Codings refused with q=0 are never sent, and * accepts the others."""
+        url = '/static/' + self.manifest['polls/style.css']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, br;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='*, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_accepted_encodings(self):
+        """Accept-Encoding weights are parsed instead of searched for names."""
+        self.assertEqual(static.accepted_encodings('gzip;q=0.5, br'), {'gzip', 'br'})
+        self.assertEqual(static.accepted_encodings('GZIP; q=0, br;q=0.0'), set())
+        self.assertEqual(static.accepted_encodings('x-gzip'), {'x-gzip'})
+        self.assertEqual(static.accepted_encodings('*;q=1, gzip;q=0'), {'br'})
+
+    def test_manifest_strict(self):
+        """Without a manifest names are used as they are, unless manifest_strict is on."""
+        with tempfile.TemporaryDirectory() as root:
+            lenient = static.PollsStaticFilesStorage(location=root, manifest_strict=False)
+            self.assertEqual(lenient.stored_name('polls/style.css'), 'polls/style.css')
+            strict = static.PollsStaticFilesStorage(location=root, manifest_strict=True)
+            with self.assertRaises(ValueError):
+                strict.stored_name('polls/style.css')
+
+    def test_outside_static_root(self):
+        """Paths escaping STATIC_ROOT are not served."""
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    @skipUnless(static.Image, 'Pillow is not installed')
+    def test_image_resized(self):
+        """Collected JPEG images are scaled down to STATIC_IMAGE_MAX_WIDTH."""
+        with override_settings(STATIC_IMAGE_MAX_WIDTH=8):
+            staticfiles_storage._optimize_image(self.manifest['polls/images/background.jpeg'])
+        with static.Image.open(os.path.join(self.root, self.manifest['polls/images/background.jpeg'])) as image:
+            self.assertLessEqual(image.width, 8)
+
+    @skipUnless(static.Image, 'Pillow is not installed')
+    def test_image_name_depends_on_settings(self):
+        """Other image settings give the optimized image another hashed name."""
+        name = 'polls/images/background.jpeg'
+        with open(finders.find(name), 'rb') as file:
+            content = file.read()
+        hashed = staticfiles_storage.hashed_name(name, ContentFile(content))
+        self.assertEqual(hashed, self.manifest[name])
+        with override_settings(STATIC_IMAGE_QUALITY=50):
+            self.assertNotEqual(staticfiles_storage.hashed_name(name, ContentFile(content)), hashed)
@@ -0,0 +1,118 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.ingest import VoteBuffer
+from polls.models import Question, VoteEvent, VoteRollupHour, VoteRollupMinute
+from polls.timeline import HOUR, MINUTE, compact_events, get_timeline
+from polls.voting import record_vote
+
+
+class VoteTimelineTests(TestCase):
+    """Tests for the vote event log and its rollups."""
+
+    def setUp(self):
+        """Create a question with two choices and two users."""
+        self.question = Question.objects.create(
+            question_text='Tea or coffee?', pub_date=timezone.now() - datetime.timedelta(days=1),
+            end_date=timezone.now() + datetime.timedelta(days=1))
+        self.tea = self.question.choice_set.create(choice_text='Tea')
+        self.coffee = self.question.choice_set.create(choice_text='Coffee')
+        self.users = [User.objects.create_user(username=f'drinker{n}') for n in range(2)]
+
+    def event(self, old_choice, new_choice, voted_at):
+        """Add a vote event at the given time."""
+        return VoteEvent.objects.create(question=self.question, old_choice=old_choice, new_choice=new_choice,
+                                        voted_at=voted_at)
+
+    def test_votes_add_events(self):
+        """First votes and changed votes add an event, voting for the same choice again doesn't."""
+        record_vote(self.users[0], self.tea)
+        record_vote(self.users[0], self.coffee)
+        record_vote(self.users[0], self.coffee)
+        self.assertEqual(list(VoteEvent.objects.order_by('id').values_list('old_choice', 'new_choice')),
+                         [(None, self.tea.id), (self.tea.id, self.coffee.id)])
+
+    def test_buffered_votes_add_events(self):
+        """Votes flushed from the vote buffer add events too."""
+        buffer = VoteBuffer()
+        buffer.add(self.users[0].id, self.question.id, self.tea.id)
+        buffer.add(self.users[1].id, self.question.id, self.coffee.id)
+        buffer.flush()
+        self.assertEqual(VoteEvent.objects.filter(old_choice=None).count(), 2)
+
+    def test_compaction(self):
+        """Events are added to the minute and hour they were cast in, once."""
+        start = datetime.datetime(2026, 10, 18, 12, 0, tzinfo=datetime.timezone.utc)
+        self.event(None, self.tea, start + datetime.timedelta(seconds=10))
+        self.event(None, self.tea, start + datetime.timedelta(seconds=50))
+        self.event(self.tea, self.coffee, start + datetime.timedelta(minutes=5))
+        self.assertEqual(compact_events(), 3)
+        self.assertEqual(compact_events(), 0)
+
+        minutes = (VoteRollupMinute.objects.order_by('bucket', 'choice_id')
+                   .values_list('bucket', 'choice', 'votes', 'lost'))
+        self.assertEqual(list(minutes), [
+            (start, self.tea.id, 2, 0),
+            (start + datetime.timedelta(minutes=5), self.tea.id, 0, 1),
+            (start + datetime.timedelta(minutes=5), self.coffee.id, 1, 0),
+        ])
+        hour = {row.choice_id: (row.votes, row.lost) for row in VoteRollupHour.objects.filter(bucket=start)}
+        self.assertEqual(hour, {self.tea.id: (2, 1), self.coffee.id: (1, 0)})
+
+        # later events add to the existing rows
+        self.event(None, self.coffee, start + datetime.timedelta(minutes=5, seconds=30))
+        self.assertEqual(compact_events(batch_size=1), 1)
+        self.assertEqual(VoteRollupHour.objects.get(bucket=start, choice=self.coffee).votes, 2)
+        self.assertFalse(VoteEvent.objects.filter(rolled_up=False).exists())
+
+    def test_get_timeline(self):
+        """The timeline has one entry per period with votes."""
+        start = datetime.datetime(2026, 10, 18, 12, 0, tzinfo=datetime.timezone.utc)
+        self.event(None, self.tea, start)
+        self.event(None, self.coffee, start + datetime.timedelta(hours=2))
+        compact_events()
+        self.assertEqual(get_timeline(self.question.id, HOUR, start), [
+            {'time': start, 'votes': 1, 'choices': {self.tea.id: {'votes': 1, 'lost': 0}}},
+            {'time': start + datetime.timedelta(hours=2), 'votes': 1,
+             'choices': {self.coffee.id: {'votes': 1, 'lost': 0}}},
+        ])
+        self.assertEqual(len(get_timeline(self.question.id, MINUTE, start + datetime.timedelta(hours=1))), 1)
+
+    def test_endpoint_reads_rollups_only(self):
+        """The timeline endpoint never reads the event table."""
+        record_vote(self.users[0], self.tea)
+        compact_events()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('polls:timeline', args=(self.question.id,)), {'resolution': 'minute'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['resolution'], 'minute')
+        self.assertEqual(data['timeline'][0]['choices'], {str(self.tea.id): {'votes': 1, 'lost': 0}})
+        self.assertFalse([query for query in queries if 'polls_voteevent' in query['sql']])
+
+    def test_endpoint_errors(self):
+        """Bad parameters are a 400 and unpublished questions a 404."""
+        url = reverse('polls:timeline', args=(self.question.id,))
+        self.assertEqual(self.client.get(url, {'resolution': 'day'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': '2020-13-01T00:00:00'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': '2026-10-01T00:00:00'}).status_code, 200)
+        self.question.pub_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_command(self):
+        """compact_vote_events rolls up the pending events."""
+        record_vote(self.users[0], self.tea)
+        record_vote(self.users[1], self.tea)
+        out = StringIO()
+        call_command('compact_vote_events', stdout=out)
+        self.assertIn('Rolled up 2 vote event(s).', out.getvalue())
@@ -0,0 +1,86 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote
+from polls.voting import record_vote
+
+
+class VoteCountTests(TestCase):
+    """Test for the stored vote counter of Choice."""
+
+    def setUp(self):
+        """Initialize a question with two choices and a logged in user."""
+        self.question = Question.objects.create(
+            question_text='Select a number',
+            pub_date=timezone.now(),
+            end_date=timezone.now() + datetime.timedelta(days=7)
+        )
+        self.first = self.question.choice_set.create(choice_text='1')
+        self.second = self.question.choice_set.create(choice_text='2')
+        self.user = User.objects.create_user(username='minion12', password='banana123')
+        self.client.force_login(self.user)
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def test_new_vote_increments_count(self):
+        """A first vote adds one to the selected choice."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 1)
+
+    def test_changed_vote_moves_count(self):
+        """Changing a vote takes one from the old choice and gives it to the new one."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.client.post(self.url, {'choice': self.second.id})
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 0)
+        self.assertEqual(self.second.vote_count, 1)
+
+    def test_same_vote_twice_counts_once(self):
+        """Voting again for the same choice doesn't change the count."""
+        self.client.post(self.url, {'choice': self.first.id})
+        self.client.post(self.url, {'choice': self.first.id})
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_vote_counts rewrites counts that don't match the Vote table."""
+        Vote.objects.create(user=self.user, question=self.question, choice=self.first)
+        Choice.objects.filter(pk=self.second.pk).update(vote_count=5)
+        out = StringIO()
+        call_command('reconcile_vote_counts', stdout=out)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 1)
+        self.assertEqual(self.second.vote_count, 0)
+        self.assertIn('Fixed 2 drifted choice(s).', out.getvalue())
+
+    def test_reconcile_keeps_votes_cast_meanwhile(self):
+        """A vote recorded after the counts were read is still counted."""
+        Choice.objects.filter(pk=self.second.pk).update(vote_count=5)
+        voter = User.objects.create_user(username='latecomer')
+
+        class VoteWhileReporting(StringIO):
+            def write(self, text):
+                if text.startswith('choice') and not Vote.objects.filter(user=voter).exists():
+                    record_vote(voter, self.choice)
+                return super().write(text)
+
+        out = VoteWhileReporting()
+        out.choice = self.second
+        call_command('reconcile_vote_counts', stdout=out)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.vote_count, 1)
+
+    def test_reconcile_dry_run(self):
+        """With --dry-run the drift is only reported."""
+        Choice.objects.filter(pk=self.second.pk).update(vote_count=5)
+        call_command('reconcile_vote_counts', '--dry-run', stdout=StringIO())
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.vote_count, 5)
@@ -2,10 +2,11 @@
 import datetime
 
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.utils import timezone
 
-from polls.models import Question
+from polls.models import Question, Vote
 from django.urls import reverse
 
 
@@ -60,3 +61,21 @@ class VoteModelTests(TestCase):
         url = reverse('polls:vote', args=(self.question.id,))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)  # unauthenticated to login page
+
+    def test_one_vote_per_question(self):
+        """Voting again replaces the earlier vote instead of adding a second one."""
+        self.question.choice_set.create(choice_text='2')
+        self.client.post(reverse('login'), self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        for choice in self.question.choice_set.all():
+            self.client.post(url, {'choice': choice.id})
+        vote = Vote.objects.get(question=self.question)
+        self.assertEqual(vote.choice.choice_text, '2')
+
+    def test_duplicate_vote_rejected(self):
+        """The database refuses a second vote row of a user on the same question."""
+        user = User.objects.get(username=self.user['username'])
+        choice = self.question.choice_set.get(choice_text='1')
+        Vote.objects.create(user=user, question=self.question, choice=choice)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=user, question=self.question, choice=choice)
@@ -0,0 +1,91 @@
+"""Votes over time, from rollups of the vote event log.
+
+Every vote adds a VoteEvent. compact_events() adds the events that aren't
+rolled up yet to the per-minute and per-hour rollup tables and marks them,
+so charts read a handful of rollup rows per period instead of scanning the
+events. Run it often with the compact_vote_events command; rollups are
+only as fresh as its last run.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import VoteEvent, VoteRollupHour, VoteRollupMinute
+
+MINUTE = 'minute'
+HOUR = 'hour'
+ROLLUPS = {MINUTE: VoteRollupMinute, HOUR: VoteRollupHour}
+
+
+class ConcurrentCompaction(Exception):
+    """Another compaction rolled up some of the same events."""
+
+
+def truncate(moment, resolution):
+    """Return the start of the minute or hour of a datetime."""
+    moment = moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0) if resolution == HOUR else moment
+
+
+def compact_events(batch_size=5000):
+    """Roll up at most batch_size events and return how many were rolled up.
+
+    Raises ConcurrentCompaction, undoing everything, if another run marked
+    any of the events first.
+
+    """
+    with transaction.atomic():
+        events = list(VoteEvent.objects.filter(rolled_up=False).order_by('id')
+                      .values_list('id', 'question_id', 'old_choice_id', 'new_choice_id', 'voted_at')[:batch_size])
+        if not events:
+            return 0
+        for resolution, model in ROLLUPS.items():
+            _add_to_rollup(model, resolution, events)
+        ids = [event[0] for event in events]
+        if VoteEvent.objects.filter(id__in=ids, rolled_up=False).update(rolled_up=True) != len(ids):
+            raise ConcurrentCompaction('Events were rolled up by another compaction.')
+    return len(events)
+
+
+def _add_to_rollup(model, resolution, events):
+    # (question, choice, bucket) -> [votes, lost]
+    totals = defaultdict(lambda: [0, 0])
+    for _, question_id, old_choice_id, new_choice_id, voted_at in events:
+        bucket = truncate(voted_at, resolution)
+        totals[(question_id, new_choice_id, bucket)][0] += 1
+        if old_choice_id is not None:
+            totals[(question_id, old_choice_id, bucket)][1] += 1
+
+    existing = {(row.choice_id, row.bucket): row for row in model.objects.filter(
+        choice_id__in={choice_id for _, choice_id, _ in totals},
+        bucket__in={bucket for _, _, bucket in totals})}
+    created, changed = [], []
+    for (question_id, choice_id, bucket), (votes, lost) in totals.items():
+        row = existing.get((choice_id, bucket))
+        if row is None:
+            created.append(model(question_id=question_id, choice_id=choice_id, bucket=bucket, votes=votes, lost=lost))
+        else:
+            row.votes += votes
+            row.lost += lost
+            changed.append(row)
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(changed, ['votes', 'lost'])
+
+
+def get_timeline(question_id, resolution, since):
+    """Return the rollups of a question from `since` on, oldest first.
+
+    Returns:
+    a list of {"time", "votes", "choices": {choice id: {"votes", "lost"}}}
+    with one entry per period that had votes.
+
+    """
+    rows = (ROLLUPS[resolution].objects.filter(question_id=question_id, bucket__gte=since)
+            .order_by('bucket', 'choice_id').values_list('bucket', 'choice_id', 'votes', 'lost'))
+    timeline = []
+    for bucket, choice_id, votes, lost in rows:
+        if not timeline or timeline[-1]['time'] != bucket:
+            timeline.append({'time': bucket, 'votes': 0, 'choices': {}})
+        timeline[-1]['votes'] += votes
+        timeline[-1]['choices'][choice_id] = {'votes': votes, 'lost': lost}
+    return timeline
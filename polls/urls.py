@@ -1,10 +1,15 @@
-from django.urls import path
+from django.urls import path, re_path
 
-from . import views
+from . import api, views
 
 app_name = 'polls'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search', views.search, name='search'),
     path('<int:pk>/', views.detail, name='detail'),
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote', views.vote, name='vote'), ]
+    path('<int:pk>/results/live', api.live_results, name='live_results'),
+    path('<int:pk>/results/timeline', api.timeline, name='timeline'),
+    path('<int:question_id>/vote', views.vote, name='vote'),
+    path('api/results', api.results, name='api_results'),
+    re_path(r'^export/(?P<kind>votes|results)\.(?P<fmt>csv|jsonl)$', api.export, name='export'), ]
@@ -1,108 +1,254 @@
 # Create your views here.
 import logging.config
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import IntegerField, OuterRef, Prefetch, Subquery, Value
 from django.dispatch import receiver
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
 from django.views import generic
 
+from mysite.auth import forget_user
+from mysite.routers import pin_to_primary, replica_reads
+
+from .cache import (aget_index_cache, aget_questions_version, aget_results, aset_index_cache, index_fragment_key,
+                    index_page_key)
+from .ingest import buffering_enabled, get_vote_buffer, overlay_pending_vote
 from .models import Question, Choice, Vote
+from .pagination import apaginate_questions, read_cursor
+from .search import search_questions
+from .voting import record_vote
 
 # logging.config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
 
-def index(request):
-    """Display all questions in the system according to publication date.
+def _resolve_user(request):
+    # request.user is lazy, evaluating it reads the session and the user table
+    request.user.is_authenticated
+    return request.user
+
+
+async def aget_user(request):
+    """Return the user of a request, loading it outside the event loop."""
+    return await sync_to_async(_resolve_user)(request)
+
+
+def _page_cacheable(request):
+    # only anonymous visitors without pending messages see the same page
+    return not _resolve_user(request).is_authenticated and not len(messages.get_messages(request))
+
+
+async def index(request):
+    """Display one page of published questions according to publication date.
+
+    The `status` parameter limits the page to open or closed questions. The
+    question list is cached for everyone until a question changes, opens or
+    closes, and anonymous visitors get the whole page from the cache.
 
     Returns:
     HttpResponseObject -- index page
 
     """
-    # Return an 'invalid login' error message.
-    all_question = Question.objects.all().order_by('-pub_date')
+    cacheable = await sync_to_async(_page_cacheable)(request)
+    now = timezone.now()
+    status = request.GET.get('status')
+    if status not in (Question.OPEN, Question.CLOSED):
+        status = None
+    cursor = request.GET.get('cursor')
+    # keyed on the position, so made-up cursors all share the first page
+    position = read_cursor(cursor)
+    if position is None:
+        cursor = None
+    version = await aget_questions_version(now)
+
+    page_key = index_page_key(version, status, position)
+    if cacheable:
+        html = await aget_index_cache(page_key)
+        if html is not None:
+            return HttpResponse(html)
+
+    can_vote = request.user.is_authenticated
+    fragment_key = index_fragment_key(version, status, position, can_vote)
+    question_list = await aget_index_cache(fragment_key)
+    if question_list is None:
+        question_list = await _render_question_list(now, status, cursor, can_vote)
+        await aset_index_cache(fragment_key, question_list)
 
-    return render(request, 'polls/index.html', {'latest_question_list': all_question})
+    response = render(request, 'polls/index.html', {
+        'question_list': question_list,
+        'status': status,
+    })
+    if cacheable:
+        await aset_index_cache(page_key, response.content.decode())
+    return response
 
 
-def detail(request, pk):
+async def _render_question_list(now, status, cursor, can_vote):
+    if status == Question.OPEN:
+        questions = Question.objects.open(now)
+    elif status == Question.CLOSED:
+        questions = Question.objects.closed(now)
+    else:
+        questions = Question.objects.published(now)
+    questions = questions.with_status(now).only('id', 'question_text', 'pub_date', 'end_date')
+    with replica_reads():
+        page, next_cursor, previous_cursor = await apaginate_questions(questions, cursor, settings.POLLS_PER_PAGE)
+    return render_to_string('polls/question_list.html', {
+        'latest_question_list': page,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'status': status,
+        'can_vote': can_vote,
+    })
+
+
+async def search(request):
+    """Display one page of the published questions matching the `q` parameter, best match first.
+
+    Returns:
+    HttpResponseObject -- search page
+
+    """
+    await aget_user(request)
+    query = request.GET.get('q', '').strip()
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    with replica_reads():
+        questions, has_next = await sync_to_async(search_questions)(
+            query, timezone.now(), page, settings.POLLS_PER_PAGE)
+    return render(request, 'polls/search.html', {
+        'query': query,
+        'questions': questions,
+        'page': page,
+        'has_next': has_next,
+    })
+
+
+async def detail(request, pk):
     """Display the detail of selected questions.
 
     Returns:
     HttpResponseObject -- detail page
 
     """
-    question = get_object_or_404(Question, pk=pk)
+    user = await aget_user(request)
+    with replica_reads():
+        question = await aget_question_detail(pk, user)
     if not question.can_vote():
         messages.error(request, "You can't vote on this question")
         return redirect('polls:index')
-    else:
-        try:
-            user_vote = get_vote_for_question(request.user, question)
-        except (KeyError, Vote.DoesNotExist):
-            return render(request, 'polls/detail.html', {'question': question})
-        return render(request, 'polls/detail.html', {'question': question, 'vote': user_vote})
+    return render(request, 'polls/detail.html', {'question': question})
 
 
-class ResultsView(generic.DetailView):
-    """Generic view that uses a template called polls/result.html."""
+class ResultsView(generic.View):
+    """View that shows the results of a question using a template called polls/result.html."""
 
-    model = Question
     template_name = 'polls/results.html'
 
+    async def get(self, request, pk):
+        """Render the aggregated choices and the total number of votes."""
+        user = await aget_user(request)
+        with replica_reads():
+            try:
+                question = await Question.objects.select_related('snapshot').aget(pk=pk)
+            except Question.DoesNotExist:
+                raise Http404('No question matches the given query.')
+            snapshot = getattr(question, 'snapshot', None)
+            if snapshot is not None and snapshot.is_current():
+                # the question is closed, its results are final
+                return render(request, self.template_name, {
+                    'question': question,
+                    'choices': snapshot.choices,
+                    'total_votes': snapshot.total_votes,
+                    'final': True,
+                })
+            choices, total_votes = await aget_results(question)
+        if buffering_enabled() and user.is_authenticated:
+            choices, total_votes = await sync_to_async(overlay_pending_vote)(choices, total_votes, user, question)
+        return render(request, self.template_name, {
+            'question': question,
+            'choices': choices,
+            'total_votes': total_votes,
+        })
+
 
-@login_required(login_url='/accounts/login/')
-def vote(request, question_id):
+async def vote(request, question_id):
     """Display the vote result of selected questions.
 
     Returns:
     HttpResponseObject -- vote page
 
     """
-    question = get_object_or_404(Question, pk=question_id)
+    user = await aget_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), '/accounts/login/')
     try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-        logger.info(
-            # printing the question text in log message may make the
-            # log message long and harder to read. the question.id is enough
-            f'{request.user} voted on {question} (id = {question.id})')
-    except (KeyError, Choice.DoesNotExist):
+        selected_choice = await Choice.objects.select_related('question').aget(
+            pk=request.POST['choice'], question_id=question_id)
+    except (KeyError, ValueError, Choice.DoesNotExist):
         # Redisplay the question voting form.
+        question = await aget_question_detail(question_id, user)
         messages.error(request, "You didn't select a choice.")
-        return render(request, 'polls/detail.html', {
-            'question': question,
-        })
-    # TODO This 'else' is not needed
+        return render(request, 'polls/detail.html', {'question': question})
+    question = selected_choice.question
+    if not question.can_vote():
+        messages.error(request, "You can't vote on this question")
+        return redirect('polls:index')
+    # only ids and loaded fields are logged: formatting must never make a query
+    log_fields = {'user_id': user.id, 'question_id': question.id, 'choice_id': selected_choice.id}
+    logger.info('%s voted on poll %s', user.username, question.id, extra=log_fields)
+    if buffering_enabled():
+        # the buffer fsyncs its journal and may replay it when first opened
+        buffer = await sync_to_async(get_vote_buffer)()
+        await sync_to_async(buffer.add)(user.id, question.id, selected_choice.id)
+        logger.debug('Buffer a vote by %s for poll %s with choice %s',
+                     user.username, question.id, selected_choice.id, extra=log_fields)
+        return pin_to_primary(HttpResponseRedirect(reverse('polls:results', args=(question.id,))))
+
+    # the ORM has no async transactions, record_vote runs in a worker thread
+    previous_choice_id = await sync_to_async(record_vote)(user, selected_choice)
+    if previous_choice_id:
+        logger.debug('Change vote by %s for poll %s from choice %s to %s',
+                     user.username, question.id, previous_choice_id, selected_choice.id, extra=log_fields)
+    else:
+        logger.debug('Create a new vote by %s for poll %s with choice %s',
+                     user.username, question.id, selected_choice.id, extra=log_fields)
+
+    # Always return an HttpResponseRedirect after successfully dealing
+    # with POST data. This prevents data from being posted twice if a
+    # user hits the Back button.
+    return pin_to_primary(HttpResponseRedirect(reverse('polls:results', args=(question.id,))))
+
+
+async def aget_question_detail(pk, user):
+    """Get a question with its choices and the choice the user voted for, in two queries.
+
+    The choices are in `question.choices`, ordered by id, and the id of the
+    user's choice is `question.selected_choice_id` (None if they haven't
+    voted). Raises Http404 if there is no such question.
+
+    """
+    if user.is_authenticated:
+        # there is at most 1 match, see the unique constraint on Vote
+        selected = Subquery(Vote.objects.filter(question=OuterRef('pk'), user=user).values('choice_id')[:1])
     else:
-        previous_vote = get_vote_for_question(request.user, question)
-        if previous_vote:
-            logger.debug(
-                f"Change vote by {request.user} for poll {question.id} from "
-                f"{previous_vote.choice} to {selected_choice}")
-            previous_vote.choice = selected_choice
-            previous_vote.save()
-        else:
-            logger.debug(f"Create a new vote by {request.user} for poll {question.id} with choice {selected_choice}")
-            Vote.objects.create(user=request.user, choice=selected_choice)
-
-        # Always return an HttpResponseRedirect after successfully dealing
-        # with POST data. This prevents data from being posted twice if a
-        # user hits the Back button.
-        return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
-
-
-def get_vote_for_question(user, question):
-    """Get a user's vote (if any) on a question."""
-    # each choice refers to a question and there should be at most 1 match
+        selected = Value(None, output_field=IntegerField())
+    questions = (Question.objects.annotate(selected_choice_id=selected)
+                 .prefetch_related(Prefetch('choice_set', Choice.objects.order_by('pk'), to_attr='choices')))
     try:
-        return user.vote_set.get(choice__question=question)
-    except Vote.DoesNotExist:
-        # no vote for this question
-        return None
+        return await questions.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404('No question matches the given query.')
 
 
 def get_client_ip(request):
@@ -118,19 +264,25 @@ def get_client_ip(request):
 @receiver(user_logged_in)
 def on_login(user, request, **kwargs):
     """Log message of login at info level including username and IP address."""
-    logger.info(f'IP: {get_client_ip(request)} {user} just logged in.')
+    forget_user(user.id)
+    ip = get_client_ip(request)
+    logger.info('IP: %s %s just logged in.', ip, user.username, extra={'ip': ip, 'user_id': user.id})
 
 
 @receiver(user_logged_out)
 def on_logout(user, request, **kwargs):
     """Log message of logout at info level including username and IP address."""
+    if user is not None:
+        forget_user(user.id)
+    ip = get_client_ip(request)
     try:
-        logger.info(f'IP: {get_client_ip(request)} {user.username} has logged out.')
+        logger.info('IP: %s %s has logged out.', ip, user.username, extra={'ip': ip, 'user_id': user.id})
     except AttributeError:
-        logger.info(f'IP: {get_client_ip(request)} has logged out.')
+        logger.info('IP: %s has logged out.', ip, extra={'ip': ip})
 
 
 @receiver(user_login_failed)
 def login_fail(credentials, request, **kwargs):
     """Log message of fail login attempt at warning level including username and IP address."""
-    logger.warning(f"IP: {get_client_ip(request)} Fail to log in for {credentials['username']}")
+    ip = get_client_ip(request)
+    logger.warning('IP: %s Fail to log in for %s', ip, credentials.get('username'), extra={'ip': ip})
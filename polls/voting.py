@@ -0,0 +1,57 @@
+"""Recording votes.
+
+The earlier vote of the user is read with SELECT ... FOR UPDATE, so it
+stays locked until the new vote and the vote counts are written. A first
+vote is inserted; if a submission racing it inserted the row first, the
+(user, question) unique constraint rejects the insert and the now
+committed row is read and locked instead. Either way the counts are moved
+from the choice that was really stored, never twice.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from mysite.sqlite import retry_on_lock
+
+from .cache import bump_results_version
+from .live import publish
+from .models import Choice, Vote, VoteEvent
+
+
+@retry_on_lock
+def record_vote(user, choice):
+    """Save the vote of a user for a choice, replacing their earlier vote on the same question.
+
+    The stored vote counts of the old and new choice are updated and a
+    VoteEvent is added in the same transaction. Once it is committed the
+    cached results of the question are invalidated and live results pages
+    are told. The transaction is retried if the database is locked.
+
+    Returns:
+    the id of the previously selected choice, or None for a first vote.
+
+    """
+    question_id = choice.question_id
+    with transaction.atomic():
+        votes = Vote.objects.filter(user=user, question_id=question_id)
+        now = timezone.now()
+        previous = votes.select_for_update().values_list('choice_id', flat=True).first()
+        if previous is None:
+            try:
+                with transaction.atomic():
+                    Vote.objects.create(user=user, question_id=question_id, choice=choice, voted_at=now)
+            except IntegrityError:
+                # another submission of this user inserted the vote first
+                previous = votes.select_for_update().values_list('choice_id', flat=True).get()
+        if previous == choice.id:
+            return previous
+        if previous is None:
+            Choice.objects.filter(pk=choice.id).update(vote_count=F('vote_count') + 1)
+        else:
+            votes.update(choice=choice, voted_at=now)
+            Choice.objects.filter(pk__in=[previous, choice.id]).update(
+                vote_count=F('vote_count') + Case(When(pk=choice.id, then=Value(1)), default=Value(-1)))
+        VoteEvent.objects.create(question_id=question_id, old_choice_id=previous, new_choice=choice, voted_at=now)
+        transaction.on_commit(lambda: bump_results_version(question_id))
+        transaction.on_commit(lambda: publish(question_id))
+    return previous